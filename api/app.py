@@ -6,21 +6,39 @@ This provides a cross-platform alternative to the Tkinter GUI.
 
 import os
 import sys
+import time
+import functools
 import threading
 import webbrowser
-from flask import Flask, render_template, request, jsonify, send_file
+import json
+import atexit
+import itertools
+import hashlib
+import secrets
+import datetime
+import traceback
+import platform
+import logging
+import asyncio
+import orjson
+from flask import Flask, Response, abort, render_template, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_executor import Executor
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
 import tempfile
 import shutil
 from pathlib import Path
 import subprocess
+from collections import OrderedDict, deque
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import distributions
 
 # Add the project root to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from core.video_processor import VideoProcessor
-from core.tiktok_transcription import transcribe_tiktok_video
 
 app = Flask(__name__)
 # Enable CORS for all routes
@@ -31,47 +49,740 @@ CORS(app, resources={
         "allow_headers": ["Content-Type"]
     }
 })
-app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
+# Request bodies are capped in enforce_body_limits below rather than with
+# MAX_CONTENT_LENGTH, so upload routes get the large limit and raw (streamed)
+# uploads are also counted as they are read.
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 500 * 1024 * 1024))  # 500MB max file size
+REQUEST_MAX_BYTES = 1024 * 1024  # JSON and other non-upload bodies
+UPLOAD_ENDPOINTS = frozenset({'upload_files', 'upload_video'})
+
+@app.before_request
+def enforce_body_limits():
+    """Refuse oversized bodies from the Content-Length header, before reading any of it."""
+    if request.endpoint in UPLOAD_ENDPOINTS:
+        limit = UPLOAD_MAX_BYTES
+    else:
+        limit = REQUEST_MAX_BYTES
+    length = request.content_length
+    if length is not None and length > limit:
+        abort(413)
+    if length is None and request.mimetype == 'multipart/form-data':
+        # A chunked form body could only be bounded after parsing it
+        abort(411)
+
+# Behind a front-end server, let it send downloads straight from disk:
+# USE_X_SENDFILE=1 for Apache/lighttpd (X-Sendfile), or X_ACCEL_REDIRECT_PREFIX
+# set to an nginx internal location aliased to the session root.
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    orjson output is always compact; keys are only sorted when
+    ``sort_keys`` is set. Types orjson can't handle go through Flask's
+    usual ``default`` (dates, dataclasses, ``__html__``).
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app.json = OrjsonProvider(app)
+# Don't sort keys or pretty-print JSON responses; the debug payloads are large
+app.json.sort_keys = False
+app.json.compact = True
+
+# Shared worker pool for video creation and transcription jobs. Capping the
+# pool at the core count (or WORKER_THREADS) keeps bursts of requests from
+# oversubscribing the CPU-bound ffmpeg pipeline; extra jobs simply queue.
+app.config['EXECUTOR_TYPE'] = 'thread'
+app.config['EXECUTOR_MAX_WORKERS'] = int(os.environ.get('WORKER_THREADS', 0)) or os.cpu_count()
+app.config['EXECUTOR_FUTURES_MAX_LENGTH'] = 256
+executor = Executor(app)
+# Jobs still queued at exit are dropped instead of being started
+atexit.register(executor.shutdown, wait=False, cancel_futures=True)
+
+class _ProgressShard:
+    """Thread-safe, size-bounded store for per-session state.
+
+    Entries are kept in least-recently-used order and the oldest one is
+    evicted once more than ``cap`` keys are held, so a long-running server
+    does not accumulate every session it has ever seen. Entries that have
+    not been written for ``ttl`` seconds are treated as gone as well.
+    Entries are replaced rather than mutated in place, so a dict returned
+    by ``get`` is a consistent snapshot. Every write bumps a per-key
+    version and wakes threads blocked in ``wait_for_change``.
+    """
+
+    def __init__(self, cap=512, ttl=None):
+        self.cap = cap
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._versions = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _drop(self, key):
+        self._data.pop(key, None)
+        self._versions.pop(key, None)
+        self._expires.pop(key, None)
+
+    def _expire(self, key):
+        """Drop ``key`` if its TTL has passed; returns whether it is still held."""
+        if key not in self._data:
+            return False
+        if self.ttl is not None and self._expires[key] <= time.monotonic():
+            self._drop(key)
+            return False
+        return True
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._expire(key)
+
+    def _store(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        if self.ttl is not None:
+            now = time.monotonic()
+            self._expires[key] = now + self.ttl
+            # Least recently used entries sit at the front; clear the expired ones
+            while self._data and self._expires[next(iter(self._data))] <= now:
+                self._drop(next(iter(self._data)))
+        while len(self._data) > self.cap:
+            evicted, _ = self._data.popitem(last=False)
+            self._versions.pop(evicted, None)
+            self._expires.pop(evicted, None)
+        self._changed.notify_all()
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def update(self, key, **fields):
+        """Merge ``fields`` into the entry for ``key``, creating it if needed."""
+        with self._lock:
+            entry = dict(self._data.get(key, {})) if self._expire(key) else {}
+            entry.update(fields)
+            self._store(key, entry)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if not self._expire(key):
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, default) if self._expire(key) else default
+            self._drop(key)
+            self._changed.notify_all()
+            return value
+
+    def wait_for_change(self, key, version, timeout=None):
+        """Block until the entry for ``key`` moves past ``version``.
+
+        Returns ``(version, value)`` for the current state of ``key``, which
+        is unchanged if ``timeout`` expired first.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._versions.get(key, 0) != version, timeout)
+            return self._versions.get(key, 0), (self._data.get(key) if self._expire(key) else None)
+
+class ProgressStore:
+    """Per-session state striped over independently locked shards.
+
+    Keys are spread over ``shards`` ``_ProgressShard`` instances by hash, so
+    progress writes from concurrent jobs and reads from request handlers
+    only contend when they land on the same shard. Each shard holds up to
+    ``cap / shards`` entries and evicts its own least recently used ones;
+    entries not written for ``ttl`` seconds expire.
+    """
+
+    def __init__(self, cap=512, shards=16, ttl=None):
+        self.cap = cap
+        self._shards = [_ProgressShard(cap=-(-cap // shards), ttl=ttl) for _ in range(shards)]
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def __contains__(self, key):
+        return key in self._shard(key)
+
+    def set(self, key, value):
+        self._shard(key).set(key, value)
+
+    def update(self, key, **fields):
+        """Merge ``fields`` into the entry for ``key``, creating it if needed."""
+        self._shard(key).update(key, **fields)
+
+    def get(self, key, default=None):
+        return self._shard(key).get(key, default)
+
+    def pop(self, key, default=None):
+        return self._shard(key).pop(key, default)
+
+    def wait_for_change(self, key, version, timeout=None):
+        """Block until the entry for ``key`` moves past ``version``; see ``_ProgressShard``."""
+        return self._shard(key).wait_for_change(key, version, timeout)
 
 # Global variables for progress tracking
-progress_data = {}
-transcription_results = {}  # Global storage for transcription results
-video_processor = VideoProcessor()
+# Entries expire an hour after their last write, like session directories
+PROGRESS_TTL = 3600
+progress_data = ProgressStore(ttl=PROGRESS_TTL)
+transcription_results = ProgressStore(ttl=PROGRESS_TTL)  # Global storage for transcription results
+
+@functools.cache
+def get_video_processor():
+    """Return the shared VideoProcessor, importing it on first use.
+
+    core.video_processor pulls in MoviePy and numpy (about half a second),
+    so it is loaded by the first job rather than at startup; routes that
+    never render, and serverless cold starts, don't pay for it.
+    """
+    from core.video_processor import VideoProcessor
+    return VideoProcessor()
+
+def _warmup():
+    """Pay MoviePy's first-use costs before the first real job does.
+
+    Locating the ffmpeg binary and decoding an image through imageio both
+    happen lazily on first clip creation; do them once with a 1x1 PNG.
+    """
+    try:
+        get_video_processor()
+        import imageio
+        import imageio_ffmpeg
+        # The ImageClip core.video_processor resolved for the installed MoviePy
+        from core.video_processor import ImageClip
+        from PIL import Image
+        imageio_ffmpeg.get_ffmpeg_exe()
+        png = BytesIO()
+        Image.new('RGB', (1, 1)).save(png, format='PNG')
+        clip = ImageClip(imageio.imread(png.getvalue()), duration=0.1)
+        clip.get_frame(0)
+        clip.close()
+    except Exception as e:
+        app.logger.warning(f"MoviePy warmup failed: {e}")
+
+def start_warmup():
+    """Warm up in the background so the server starts accepting requests at once.
+
+    Called by serve_app only: importing this module (tests, WSGI servers,
+    serverless cold starts) leaves MoviePy unloaded until a job needs it.
+    """
+    threading.Thread(target=_warmup, name='moviepy-warmup', daemon=True).start()
+
+# Every session gets a sub-directory of one shared root. Names come from a
+# per-process counter, so allocating one costs a single mkdir. The root lives
+# on tmpfs when /dev/shm is mounted with room for a few full-size uploads, so
+# short-lived session files never reach the disk.
+SHM_DIR = '/dev/shm'
+SHM_MIN_FREE = 4 * UPLOAD_MAX_BYTES
+
+def _session_base():
+    if os.path.ismount(SHM_DIR):
+        try:
+            if shutil.disk_usage(SHM_DIR).free >= SHM_MIN_FREE:
+                return Path(SHM_DIR)
+        except OSError:
+            pass
+    return Path(tempfile.gettempdir())
+
+SESSION_ROOT = _session_base() / 'dvc-sessions'
+SESSION_ROOT.mkdir(exist_ok=True)
+
+# Uploaded files are stored once per distinct content: each session's copy is
+# hard-linked with a blob named by its SHA-256 here, so re-uploaded images share
+# storage. The session sweep removes blobs that no session links to any more.
+UPLOAD_CAS = SESSION_ROOT / '.cas'
+UPLOAD_CAS.mkdir(exist_ok=True)
+
+_session_lock = threading.Lock()
+
+class TempDirPool:
+    """Bounded pool of emptied session directories kept for reuse.
+
+    Released directories are wiped in place and parked under a hidden
+    ``.free-N`` name in ``root``; ``acquire`` renames one back to the new
+    session id instead of creating a directory from scratch. Once ``cap``
+    directories are parked, further releases are simply removed.
+    """
+
+    def __init__(self, root, cap=16):
+        self.root = Path(root)
+        self.cap = cap
+        self.free = deque()
+        self._lock = threading.Lock()
+        self._spare_names = itertools.count()
+
+    def acquire(self, name):
+        """Return the path of an empty directory called ``name`` in ``root``.
+
+        Raises ``FileExistsError`` if ``name`` is already taken.
+        """
+        path = self.root / name
+        if path.exists():
+            raise FileExistsError(str(path))
+        with self._lock:
+            spare = self.free.popleft() if self.free else None
+        if spare is not None:
+            try:
+                os.rename(spare, path)
+                return str(path)
+            except OSError:
+                shutil.rmtree(spare, ignore_errors=True)
+        path.mkdir()
+        return str(path)
+
+    def release(self, path):
+        """Empty ``path`` and keep it for a later ``acquire``."""
+        try:
+            for entry in os.scandir(path):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            with self._lock:
+                if len(self.free) < self.cap:
+                    spare = self.root / f".free-{os.getpid()}-{next(self._spare_names)}"
+                    os.rename(path, spare)
+                    self.free.append(spare)
+                    return
+        except OSError:
+            pass
+        shutil.rmtree(path, ignore_errors=True)
+
+temp_dir_pool = TempDirPool(SESSION_ROOT)
+
+def new_session_id():
+    """Return a fresh, unguessable session id.
+
+    Session ids double as the only credential for /download and
+    /get_transcription, so the part after the pid is random rather than a
+    counter. The pid prefix lets a process find its own directories at exit.
+    """
+    return f"{os.getpid()}-{secrets.token_urlsafe(12)}"
+
+def create_session_dir():
+    """Allocate a fresh directory under SESSION_ROOT.
+
+    Returns ``(session_id, temp_dir)``. A leftover directory from an earlier
+    process with the same pid is skipped rather than reused.
+    """
+    while True:
+        session_id = new_session_id()
+        try:
+            return session_id, temp_dir_pool.acquire(session_id)
+        except FileExistsError:
+            continue
+
+# Upload metadata keyed by session id, so /create_video does not have to
+# rediscover the files by listing the session directory.
+sessions = {}
+_sessions_lock = threading.Lock()
+
+# Each session also writes its metadata to a small manifest file, so other
+# workers and a restarted server can pick it up without listing the directory.
+SESSION_MANIFEST = 'session.json'
+
+# Held from snapshot to rename, so an older snapshot can never replace a newer
+# manifest; the files are tiny, so one lock for all sessions is enough
+_manifest_lock = threading.Lock()
+
+def register_session(session_id, session_data):
+    manifest = os.path.join(session_data['temp_dir'], SESSION_MANIFEST)
+    with _manifest_lock:
+        with _sessions_lock:
+            sessions[session_id] = session_data
+            # Snapshot while no request can be changing the session
+            payload = orjson.dumps(session_data)
+        # Write then rename, so readers never see a half-written manifest; the
+        # temporary name is unique, so other processes' writers can't collide
+        fd, tmp = tempfile.mkstemp(dir=session_data['temp_dir'], suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, manifest)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+def get_session(session_id):
+    """Return a session's metadata from memory or its manifest, or None."""
+    with _sessions_lock:
+        session_data = sessions.get(session_id)
+    if session_data is not None:
+        return session_data
+    if not session_id or os.path.basename(session_id) != session_id or session_id.startswith('.'):
+        return None
+    try:
+        with open(os.path.join(SESSION_ROOT, session_id, SESSION_MANIFEST), 'rb') as f:
+            session_data = orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    with _sessions_lock:
+        return sessions.setdefault(session_id, session_data)
+
+def drop_session(session_id):
+    with _sessions_lock:
+        sessions.pop(session_id, None)
+
+# A downloaded session is kept for a grace period so that resumed (Range)
+# downloads can still find the video, then its directory goes back to the pool.
+DOWNLOAD_GRACE_PERIOD = 300
+_ending_sessions = set()
+
+def end_session(session_id, temp_dir):
+    """Forget a session and release its directory."""
+    progress_data.pop(f"{session_id}_create")
+    drop_session(session_id)
+    with _sessions_lock:
+        _ending_sessions.discard(session_id)
+    temp_dir_pool.release(temp_dir)
+
+def schedule_session_end(session_id, temp_dir):
+    """End a session after DOWNLOAD_GRACE_PERIOD, once per session."""
+    with _sessions_lock:
+        if session_id in _ending_sessions:
+            return
+        _ending_sessions.add(session_id)
+    timer = threading.Timer(DOWNLOAD_GRACE_PERIOD, end_session, args=(session_id, temp_dir))
+    timer.daemon = True
+    timer.start()
+
+# Sessions whose directory has not been touched for SESSION_TTL seconds are
+# removed by a background sweep, so jobs that fail before /download do not
+# leak their uploads.
+SESSION_TTL = 3600
+SESSION_SWEEP_INTERVAL = 600
+_janitor_started = False
+
+def sweep_stale_sessions(now=None):
+    """Remove session directories older than SESSION_TTL that have no running job."""
+    now = time.time() if now is None else now
+    with os.scandir(SESSION_ROOT) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                age = now - entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            if age <= SESSION_TTL:
+                continue
+            progress = progress_data.get(f"{entry.name}_create")
+            if progress is not None and not _is_finished(progress):
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            drop_session(entry.name)
+    # Blobs whose only remaining link is their own name belong to no session
+    with os.scandir(UPLOAD_CAS) as entries:
+        for entry in entries:
+            try:
+                if entry.stat(follow_symlinks=False).st_nlink == 1:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+    with _sessions_lock:
+        gone = [sid for sid, data in sessions.items()
+                if not os.path.isdir(data['temp_dir'])]
+        for sid in gone:
+            del sessions[sid]
+
+def _session_janitor():
+    while True:
+        time.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            sweep_stale_sessions()
+        except Exception as e:
+            app.logger.error(f"Session cleanup failed: {e}")
+
+def start_session_janitor():
+    """Start the background sweep once per process."""
+    global _janitor_started
+    with _session_lock:
+        if _janitor_started:
+            return
+        _janitor_started = True
+    threading.Thread(target=_session_janitor, name='session-janitor', daemon=True).start()
+
+# Render workers are spawned, and when the app runs as a script each one
+# re-imports this module as __mp_main__. A janitor there would see none of
+# the parent's jobs and sweep sessions that are still rendering.
+if __name__ != '__mp_main__':
+    start_session_janitor()
+
+@atexit.register
+def _remove_own_sessions():
+    """Remove this process's session and pooled directories on exit."""
+    pid = os.getpid()
+    prefixes = (f"{pid}-", f".free-{pid}-")
+    try:
+        with os.scandir(SESSION_ROOT) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefixes):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+    except OSError:
+        pass
+
+# Uploads are copied to disk in 1 MiB chunks instead of werkzeug's 16 KiB default
+UPLOAD_CHUNK_SIZE = 1 << 20
+UPLOAD_SAVE_WORKERS = 8
+# Shared by all requests, so concurrent uploads don't each spawn their own
+# threads and the total number of writers stays bounded
+upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_SAVE_WORKERS, thread_name_prefix='upload')
+
+def upload_filename(prefix, filename, fallback):
+    """Return ``prefix`` + the sanitized user ``filename``.
+
+    Only the user-supplied part goes through ``secure_filename``. If nothing
+    usable survives, or only the bare extension does (e.g. non-ASCII stems),
+    ``fallback`` is used with the original extension, or ``.bin``.
+    """
+    safe = secure_filename(filename)
+    ext = os.path.splitext(filename)[1]
+    if not safe or (ext and '.' not in safe):
+        ext = secure_filename(ext)
+        return f"{fallback}.{ext or 'bin'}"
+    return prefix + safe
+
+def save_stream(stream, filepath, limit=None):
+    """Copy ``stream`` to ``filepath`` in UPLOAD_CHUNK_SIZE reads.
+
+    With ``limit``, a running total is kept and ``RequestEntityTooLarge``
+    is raised (and the partial file removed) once more bytes arrive.
+    """
+    if limit is None:
+        with open(filepath, 'wb') as dst:
+            shutil.copyfileobj(stream, dst, UPLOAD_CHUNK_SIZE)
+        return
+    total = 0
+    try:
+        with open(filepath, 'wb') as dst:
+            while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > limit:
+                    raise RequestEntityTooLarge()
+                dst.write(chunk)
+    except RequestEntityTooLarge:
+        os.unlink(filepath)
+        raise
+
+def _share_upload(filepath, digest):
+    """Make ``filepath`` a link to the stored blob for ``digest``, storing it if new."""
+    blob = UPLOAD_CAS / digest
+    try:
+        os.link(filepath, blob)
+        return
+    except FileExistsError:
+        pass
+    except OSError:
+        return  # no hard links on this filesystem; keep the plain copy
+    try:
+        os.link(blob, filepath + '.dup')
+        os.replace(filepath + '.dup', filepath)
+    except OSError:
+        pass  # the blob was just swept; the fresh copy stands
+
+def save_upload(file, filepath):
+    """Stream an uploaded file to disk, sharing storage with identical earlier uploads."""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as dst:
+        while chunk := file.stream.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            dst.write(chunk)
+    _share_upload(filepath, digest.hexdigest())
+
+def is_raw_upload():
+    """Whether the request body is a bare file rather than multipart form data.
+
+    Raw uploads skip werkzeug's multipart parser: the body is copied
+    straight from ``request.stream`` and metadata comes from the query
+    string (``filename`` plus the usual form fields).
+    """
+    return request.mimetype == 'application/octet-stream'
+
+def int_arg(name, default, minimum=0):
+    """Return query argument ``name`` as an int of at least ``minimum``.
+
+    Missing arguments give ``default``; anything else that isn't such an
+    int raises ValueError.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    value = int(value)
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+# Indices of raw image uploads still being received, by session:
+# {session_id: {index: claim}}; guarded by _sessions_lock
+_image_claims = {}
+
+def _release_image_claim(session_id, index, claim):
+    """Drop ``claim`` on an image index; return whether it was still the latest one."""
+    claims = _image_claims.get(session_id, {})
+    latest = claims.get(index) is claim
+    if latest:
+        del claims[index]
+        if not claims:
+            del _image_claims[session_id]
+    return latest
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+def upload_raw_file():
+    """Handle one raw image or audio file posted to /upload.
+
+    The first request creates the session; later ones pass its
+    ``session_id`` to add more files. ``kind`` is ``image`` (default) or
+    ``audio``, and ``index`` fixes an image's position when files are sent
+    in parallel; sending an index again replaces that image.
+    """
+    filename = request.args.get('filename', '')
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+    try:
+        index = int_arg('index', None)
+        settings = {'width': int_arg('width', 1920, 1), 'height': int_arg('height', 1080, 1),
+                    'fps': int_arg('fps', 30, 1)}
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    
+    session_id = request.args.get('session_id')
+    if session_id:
+        session_data = get_session(session_id)
+        if session_data is None:
+            return jsonify({'error': 'Session expired or invalid'}), 400
+        temp_dir = session_data['temp_dir']
+    else:
+        session_id, temp_dir = create_session_dir()
+        session_data = {
+            'temp_dir': temp_dir,
+            'image_paths': [],
+            'audio_path': None,
+            'output_path': os.path.join(temp_dir, 'output.mp4'),
+            **settings
+        }
+    
+    if request.args.get('kind', 'image') == 'audio':
+        audio_path = os.path.join(temp_dir, upload_filename("audio_", filename, "audio"))
+        save_stream(request.stream, audio_path, UPLOAD_MAX_BYTES)
+        with _sessions_lock:
+            session_data['audio_path'] = audio_path
+    else:
+        with _sessions_lock:
+            # Images by index; string keys so the manifest round-trips through JSON
+            slots = session_data.setdefault(
+                'image_slots', {str(i): path for i, path in enumerate(session_data['image_paths'])})
+            # The index is claimed before the body is read, so parallel
+            # uploads without one get distinct indices
+            claims = _image_claims.setdefault(session_id, {})
+            if index is None:
+                index = max([*map(int, slots), *claims], default=-1) + 1
+            claim = claims[index] = object()
+        image_path = os.path.join(temp_dir, upload_filename(f"image_{index:03d}_", filename, f"image_{index:03d}"))
+        # Received under a name of its own and renamed into place, so two
+        # uploads for the same index never write to one file
+        fd, part_path = tempfile.mkstemp(dir=temp_dir, suffix='.part')
+        os.close(fd)
+        try:
+            save_stream(request.stream, part_path, UPLOAD_MAX_BYTES)
+        except BaseException:
+            with _sessions_lock:
+                _release_image_claim(session_id, index, claim)
+            _remove_file(part_path)
+            raise
+        with _sessions_lock:
+            # Only the latest upload for an index is kept
+            latest = _release_image_claim(session_id, index, claim)
+            if latest:
+                replaced = slots.get(str(index))
+                os.replace(part_path, image_path)
+                slots[str(index)] = image_path
+                session_data['image_paths'] = [slots[i] for i in sorted(slots, key=int)]
+        if not latest:
+            _remove_file(part_path)
+        elif replaced and replaced != image_path:
+            _remove_file(replaced)
+    register_session(session_id, session_data)
+    
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'image_count': len(session_data['image_paths']),
+        'has_audio': session_data['audio_path'] is not None,
+        'settings': {key: session_data[key] for key in ('width', 'height', 'fps')}
+    })
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/warm')
+def warm():
+    """Cheap target for keep-alive pings.
+
+    It also loads the video processor, so on a serverless instance the
+    ping pays that import instead of the first render.
+    """
+    get_video_processor()
+    return '', 204
+
 @app.route('/upload', methods=['POST'])
 def upload_files():
     try:
+        if is_raw_upload():
+            return upload_raw_file()
+        
         # Create temporary directory for this session
-        temp_dir = tempfile.mkdtemp()
+        session_id, temp_dir = create_session_dir()
         
         # Handle image files
         image_files = request.files.getlist('images')
         if not image_files or len(image_files) == 0:
             return jsonify({'error': 'No image files provided'}), 400
         
-        image_paths = []
+        # Name every file up front so the index prefix keeps upload order
+        uploads = []
         for i, file in enumerate(image_files):
             if file.filename == '':
                 continue
-            filename = secure_filename(f"image_{i:03d}_{file.filename}")
-            filepath = os.path.join(temp_dir, filename)
-            file.save(filepath)
-            image_paths.append(filepath)
+            filename = upload_filename(f"image_{i:03d}_", file.filename, f"image_{i:03d}")
+            uploads.append((file, os.path.join(temp_dir, filename)))
         
-        if len(image_paths) == 0:
+        if len(uploads) == 0:
             return jsonify({'error': 'No valid image files uploaded'}), 400
         
+        # Save images concurrently so their disk writes overlap
+        list(upload_pool.map(lambda upload: save_upload(*upload), uploads))
+        image_paths = [filepath for _, filepath in uploads]
+        
         # Handle audio file (optional)
         audio_path = None
         audio_file = request.files.get('audio')
         if audio_file and audio_file.filename != '':
-            audio_filename = secure_filename(f"audio_{audio_file.filename}")
+            audio_filename = upload_filename("audio_", audio_file.filename, "audio")
             audio_path = os.path.join(temp_dir, audio_filename)
-            audio_file.save(audio_path)
+            save_upload(audio_file, audio_path)
         
         # Get video settings
         width = int(request.form.get('width', 1920))
@@ -94,18 +805,69 @@ def upload_files():
             'height': height,
             'fps': fps
         }
+        register_session(session_id, session_data)
         
         return jsonify({
             'success': True,
-            'session_id': os.path.basename(temp_dir),
+            'session_id': session_id,
             'image_count': len(image_paths),
             'has_audio': audio_path is not None,
             'settings': {'width': width, 'height': height, 'fps': fps}
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def make_progress_callback(key):
+    """Return a callback that records a job's progress under ``key``."""
+    def progress_callback(message, progress=None):
+        if progress is not None:
+            progress_data.update(key, progress=progress, message=message)
+        else:
+            progress_data.update(key, message=message)
+    return progress_callback
+
+# Job bodies run on the executor's worker threads. They are plain module-level
+# functions taking everything they need as arguments, rather than closures
+# over request state. Jobs stay in-process because the SSE stream waits on
+# ProgressStore's condition variable, and the heavy encoding already runs in
+# ffmpeg subprocesses outside the GIL.
+def _run_create(key, image_paths, audio_path, output_path, aspect_ratio, fps,
+                multi_video_mode, green_screen_duration):
+    progress_callback = make_progress_callback(key)
+    try:
+        video_processor = get_video_processor()
+        if multi_video_mode:
+            video_processor.create_multi_video_with_separators(
+                image_paths=image_paths,
+                audio_path=audio_path,
+                output_path=output_path,
+                aspect_ratio=aspect_ratio,
+                fps=fps,
+                green_screen_duration=green_screen_duration,
+                progress_callback=progress_callback
+            )
+        else:
+            # Get dimensions from aspect ratio for single video mode
+            width, height = video_processor.get_aspect_ratio_dimensions(aspect_ratio)
+            video_processor.create_video_from_images(
+                image_paths=image_paths,
+                audio_path=audio_path,
+                output_path=output_path,
+                width=width,
+                height=height,
+                fps=fps,
+                progress_callback=progress_callback
+            )
+        progress_data.update(key, progress=100, message='Video creation completed!')
+    except Exception as e:
+        tb_str = traceback.format_exc()
+        error_message = f'Error: {str(e)}\nTraceback:\n{tb_str}'
+        progress_data.update(key, message=error_message)
+        app.logger.error(error_message)
+
 @app.route('/create_video', methods=['POST'])
 def create_video():
     try:
@@ -115,17 +877,13 @@ def create_video():
         if not session_id:
             return jsonify({'error': 'No session ID provided'}), 400
         
-        # Reconstruct session data (in a real app, you'd store this in a database or session)
-        temp_dir = os.path.join(tempfile.gettempdir(), session_id)
-        if not os.path.exists(temp_dir):
+        # Session data comes from the registry or the manifest written at upload
+        session_data = get_session(session_id)
+        if session_data is None:
             return jsonify({'error': 'Session expired or invalid'}), 400
-        
-        # Find files in temp directory
-        image_files = sorted([f for f in os.listdir(temp_dir) if f.startswith('image_')])
-        audio_files = [f for f in os.listdir(temp_dir) if f.startswith('audio_')]
-        
-        image_paths = [os.path.join(temp_dir, f) for f in image_files]
-        audio_path = os.path.join(temp_dir, audio_files[0]) if audio_files else None
+        temp_dir = session_data['temp_dir']
+        image_paths = session_data.get('image_paths', [])
+        audio_path = session_data.get('audio_path')
         output_path = os.path.join(temp_dir, 'output.mp4')
         
         # Get video settings
@@ -134,65 +892,44 @@ def create_video():
         multi_video_mode = data.get('multi_video_mode', True)  # Always True by default
         green_screen_duration = data.get('green_screen_duration', 5.0)  # Default 5 seconds
         
-        # Debug logging
-        print(f"DEBUG: Received request data: {data}")
-        print(f"DEBUG: multi_video_mode = {multi_video_mode}")
-        print(f"DEBUG: green_screen_duration = {green_screen_duration}")
-        print(f"DEBUG: Found {len(image_paths)} images")
-        if image_paths:
-            print(f"DEBUG: First few image names: {[os.path.basename(p) for p in image_paths[:5]]}")
+        # Debug logging; arguments are only formatted when DEBUG is enabled
+        app.logger.debug("Received request data: %s", data)
+        app.logger.debug("multi_video_mode = %s, green_screen_duration = %s, %d images",
+                         multi_video_mode, green_screen_duration, len(image_paths))
+        if image_paths and app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug("First few image names: %s", [os.path.basename(p) for p in image_paths[:5]])
         
-        # Reset progress
         key = f"{session_id}_create"
-        progress_data[key] = {'progress': 0, 'message': 'Starting video creation...'}
-        
-        def progress_callback(message, progress=None):
-            if progress is not None:
-                progress_data[key]['progress'] = progress
-            progress_data[key]['message'] = message
-        
-        # Create video in a separate thread
-        def create_video_thread():
-            try:
-                if multi_video_mode:
-                    video_processor.create_multi_video_with_separators(
-                        image_paths=image_paths,
-                        audio_path=audio_path,
-                        output_path=output_path,
-                        aspect_ratio=aspect_ratio,
-                        fps=fps,
-                        green_screen_duration=green_screen_duration,
-                        progress_callback=progress_callback
-                    )
-                else:
-                    # Get dimensions from aspect ratio for single video mode
-                    width, height = video_processor.get_aspect_ratio_dimensions(aspect_ratio)
-                    video_processor.create_video_from_images(
-                        image_paths=image_paths,
-                        audio_path=audio_path,
-                        output_path=output_path,
-                        width=width,
-                        height=height,
-                        fps=fps,
-                        progress_callback=progress_callback
-                    )
-                progress_data[key]['progress'] = 100
-                progress_data[key]['message'] = 'Video creation completed!'
-            except Exception as e:
-                import traceback
-                tb_str = traceback.format_exc()
-                error_message = f'Error: {str(e)}\nTraceback:\n{tb_str}'
-                progress_data[key]['message'] = error_message
-                app.logger.error(error_message)
-        
-        thread = threading.Thread(target=create_video_thread)
-        thread.start()
+        # One lock from the check to the submit, so a double click can't
+        # start two renders into the same output file
+        with _jobs_lock:
+            if executor.futures.done(key) is False:
+                return jsonify({'success': True, 'message': 'Video creation already in progress'})
+            
+            # Reset progress
+            progress_data.set(key, {'progress': 0, 'message': 'Starting video creation...'})
+            
+            # Drop the finished job from a previous run of this session before
+            # storing the new one under the same key
+            executor.futures.pop(key)
+            executor.submit_stored(key, _run_create, key, image_paths, audio_path, output_path,
+                                   aspect_ratio, fps, multi_video_mode, green_screen_duration)
         
         return jsonify({'success': True, 'message': 'Video creation started'})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Guards checking, replacing and releasing the futures stored per job key
+_jobs_lock = threading.Lock()
+
+def _reap_job(key):
+    """Mark the job stored under key done and release its future, once it has finished."""
+    with _jobs_lock:
+        if executor.futures.done(key) and key in progress_data:
+            executor.futures.pop(key)
+            progress_data.update(key, done=True)
+
 @app.route('/progress')
 def get_progress():
     session_id = request.args.get('session_id')
@@ -201,18 +938,86 @@ def get_progress():
         return jsonify({'error': 'Session ID required'}), 400
 
     key = f"{session_id}_{task_type}"
+    # The stored future is the authoritative completion signal; once the
+    # worker has finished we record that and release the future
+    _reap_job(key)
     return jsonify(progress_data.get(key, {'progress': 0, 'message': 'Waiting...'}))
 
+PROGRESS_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+# Each open stream holds a server thread, so none lives longer than this;
+# EventSource reconnects by itself when the server closes the connection
+PROGRESS_STREAM_MAX_AGE = 300
+
+def _is_finished(progress):
+    """Whether a progress entry describes a job that will not update again."""
+    return (progress.get('done') or progress.get('progress', 0) >= 100
+            or 'error' in progress.get('message', '').lower())
+
+@app.route('/progress_stream')
+def progress_stream():
+    """Push progress updates as Server-Sent Events over one connection."""
+    session_id = request.args.get('session_id')
+    task_type = request.args.get('type', 'create')
+    if not session_id:
+        return jsonify({'error': 'Session ID required'}), 400
+
+    key = f"{session_id}_{task_type}"
+    # The futures proxy returns None for keys it has never seen
+    if key not in progress_data and executor.futures.done(key) is None:
+        return jsonify({'error': 'Unknown session'}), 404
+
+    def generate():
+        version = None
+        deadline = time.monotonic() + PROGRESS_STREAM_MAX_AGE
+        while time.monotonic() < deadline:
+            _reap_job(key)
+            new_version, progress = progress_data.wait_for_change(
+                key, version, timeout=PROGRESS_STREAM_HEARTBEAT)
+            if new_version == version:
+                if key not in progress_data and executor.futures.done(key) is None:
+                    # The job and its progress have expired; nothing will follow
+                    break
+                # Nothing changed; the comment keeps proxies from closing
+                # the connection and lets us notice a departed client
+                yield ': keep-alive\n\n'
+                continue
+            version = new_version
+            progress = progress or {'progress': 0, 'message': 'Waiting...'}
+            yield f"data: {app.json.dumps(progress)}\n\n"
+            if _is_finished(progress):
+                break
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/download/<session_id>')
 def download_video(session_id):
     try:
-        temp_dir = os.path.join(tempfile.gettempdir(), session_id)
+        session_data = get_session(session_id)
+        if session_data is None:
+            return jsonify({'error': 'Session expired or invalid'}), 400
+        temp_dir = session_data['temp_dir']
         output_path = os.path.join(temp_dir, 'output.mp4')
         
-        if not os.path.exists(output_path):
+        try:
+            last_modified = os.path.getmtime(output_path)
+        except OSError:
             return jsonify({'error': 'Video file not found'}), 404
         
-        return send_file(output_path, as_attachment=True, download_name='video_output.mp4')
+        if X_ACCEL_REDIRECT_PREFIX:
+            # nginx serves the file, including Range requests
+            response = app.response_class(mimetype='video/mp4')
+            response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{session_id}/output.mp4"
+            response.headers['Content-Disposition'] = 'attachment; filename=video_output.mp4'
+            schedule_session_end(session_id, temp_dir)
+            return response
+        
+        # Conditional responses let clients resume an interrupted download
+        # with a Range request instead of fetching the whole video again.
+        response = send_file(output_path, as_attachment=True, download_name='video_output.mp4',
+                             conditional=True, etag=True, last_modified=last_modified)
+        schedule_session_end(session_id, temp_dir)
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -221,20 +1026,29 @@ def download_video(session_id):
 def upload_video():
     try:
         # Create temporary directory for this session
-        temp_dir = tempfile.mkdtemp()
+        session_id, temp_dir = create_session_dir()
         
-        # Handle video file
-        video_file = request.files.get('video')
-        if not video_file or video_file.filename == '':
+        # Handle video file, either raw in the body or as a multipart field
+        if is_raw_upload():
+            video_name = request.args.get('filename', '')
+            settings = request.args
+        else:
+            video_file = request.files.get('video')
+            video_name = video_file.filename if video_file else ''
+            settings = request.form
+        if not video_name:
             return jsonify({'error': 'No video file provided'}), 400
         
         # Save video file
-        video_filename = secure_filename(f"input_{video_file.filename}")
+        video_filename = upload_filename("input_", video_name, "input")
         video_path = os.path.join(temp_dir, video_filename)
-        video_file.save(video_path)
+        if is_raw_upload():
+            save_stream(request.stream, video_path, UPLOAD_MAX_BYTES)
+        else:
+            save_upload(video_file, video_path)
         
         # Get settings
-        green_threshold = float(request.form.get('green_threshold', 0.8))
+        green_threshold = float(settings.get('green_threshold', 0.8))
         
         # Store session data
         session_data = {
@@ -242,17 +1056,76 @@ def upload_video():
             'video_path': video_path,
             'green_threshold': green_threshold
         }
+        register_session(session_id, session_data)
         
         return jsonify({
             'success': True,
-            'session_id': os.path.basename(temp_dir),
-            'video_name': video_file.filename,
+            'session_id': session_id,
+            'video_name': video_name,
             'settings': {'green_threshold': green_threshold}
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Session id of the running transcription for each URL hash
+_inflight_transcriptions = {}
+_transcriptions_lock = threading.Lock()
+
+# Transcription is network-bound (the yt-dlp download, then the Deepgram
+# request), so jobs run as tasks on one background event loop rather than
+# holding the executor threads that video encoding needs. Only the yt-dlp
+# step still occupies a thread, from the loop's own default pool.
+_transcribe_loop = None
+_transcribe_loop_lock = threading.Lock()
+
+def transcribe_loop():
+    """Return the event loop transcription jobs run on, starting it on first use."""
+    global _transcribe_loop
+    with _transcribe_loop_lock:
+        if _transcribe_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='transcribe-loop', daemon=True).start()
+            _transcribe_loop = loop
+        return _transcribe_loop
+
+def _load_transcriber():
+    # Imported on first use: the Deepgram SDK and yt-dlp are slow to load
+    from core.tiktok_transcription import get_transcriber
+    return get_transcriber()
+
+async def _run_transcribe(key, session_id, url, url_hash):
+    try:
+        # The import and the transcriber's setup block, so they run off the loop
+        transcriber = await asyncio.to_thread(_load_transcriber)
+        report = make_progress_callback(key)
+        
+        def progress_callback(message, progress=None):
+            # 100% is reported below, once the result has been stored
+            if progress is None or progress < 100:
+                report(message, progress)
+        
+        result = await transcriber.atranscribe_tiktok_url(url, progress_callback=progress_callback)
+        transcription_results.set(session_id, result)
+        
+        if result['success']:
+            transcription_results.set(url_hash, result)
+            progress_data.update(key, progress=100, message='Transcription completed successfully!')
+        else:
+            progress_data.update(key, message=f'Transcription failed: {result.get("error", "Unknown error")}')
+            
+    except Exception as e:
+        tb_str = traceback.format_exc()
+        error_message = f'Error: {str(e)}\nTraceback\n{tb_str}'
+        progress_data.update(key, message=error_message)
+        transcription_results.set(session_id, {'success': False, 'error': error_message})
+        app.logger.error(error_message)
+    finally:
+        with _transcriptions_lock:
+            _inflight_transcriptions.pop(url_hash, None)
+
 @app.route('/transcribe_tiktok', methods=['POST'])
 def transcribe_tiktok():
     try:
@@ -262,41 +1135,36 @@ def transcribe_tiktok():
         if not url:
             return jsonify({'error': 'No TikTok URL provided'}), 400
         
-        # Create session for this transcription
-        temp_dir = tempfile.mkdtemp()
-        session_id = os.path.basename(temp_dir)
+        # Repeated requests for the same URL share one job: while it runs they
+        # get its session id, and afterwards a successful result is reused.
+        url_hash = hashlib.sha256(url.strip().encode()).hexdigest()
+        with _transcriptions_lock:
+            running = _inflight_transcriptions.get(url_hash)
+            if running is not None:
+                return jsonify({'success': True, 'session_id': running,
+                                'message': 'Transcription already in progress'})
+            # Transcription works in its own scratch space, so only an id is needed
+            session_id = new_session_id()
+            key = f"{session_id}_transcribe"
+            cached = transcription_results.get(url_hash)
+            if cached is not None:
+                transcription_results.set(session_id, cached)
+                progress_data.set(key, {'progress': 100, 'message': 'Transcription completed successfully!'})
+                return jsonify({'success': True, 'session_id': session_id, 'message': 'Transcription started'})
+            _inflight_transcriptions[url_hash] = session_id
         
         # Reset progress
-        key = f"{session_id}_transcribe"
-        progress_data[key] = {'progress': 0, 'message': 'Starting TikTok transcription...'}
+        progress_data.set(key, {'progress': 0, 'message': 'Starting TikTok transcription...'})
         
-        def progress_callback(message, progress=None):
-            if progress is not None:
-                progress_data[key]['progress'] = progress
-            progress_data[key]['message'] = message
-        
-        # Transcribe in a separate thread
-        def transcribe_thread():
-            try:
-                result = transcribe_tiktok_video(url, progress_callback)
-                transcription_results[session_id] = result
-                
-                if result['success']:
-                    progress_data[key]['progress'] = 100
-                    progress_data[key]['message'] = 'Transcription completed successfully!'
-                else:
-                    progress_data[key]['message'] = f'Transcription failed: {result.get("error", "Unknown error")}'
-                    
-            except Exception as e:
-                import traceback
-                tb_str = traceback.format_exc()
-                error_message = f'Error: {str(e)}\nTraceback\n{tb_str}'
-                progress_data[key]['message'] = error_message
-                transcription_results[session_id] = {'success': False, 'error': error_message}
-                app.logger.error(error_message)
-        
-        thread = threading.Thread(target=transcribe_thread)
-        thread.start()
+        try:
+            # Stored with the executor's futures so /progress sees it finish
+            future = asyncio.run_coroutine_threadsafe(
+                _run_transcribe(key, session_id, url, url_hash), transcribe_loop())
+            executor.futures.add(key, future)
+        except Exception:
+            with _transcriptions_lock:
+                _inflight_transcriptions.pop(url_hash, None)
+            raise
         
         return jsonify({'success': True, 'session_id': session_id, 'message': 'Transcription started'})
         
@@ -307,11 +1175,10 @@ def transcribe_tiktok():
 def get_transcription(session_id):
     try:
         # Check if transcription results exist
-        if session_id not in transcription_results:
+        result = transcription_results.get(session_id)
+        if result is None:
             return jsonify({'error': 'Transcription not found or still in progress'}), 404
         
-        result = transcription_results[session_id]
-        
         if result['success']:
             return jsonify({
                 'success': True,
@@ -329,69 +1196,136 @@ def get_transcription(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/debug')
+DEBUG_CACHE_TTL = 60  # seconds
+
+_ttl_cache_entries = {}
+_ttl_cache_lock = threading.Lock()
+
+def ttl_cache(seconds):
+    """Memoize a function's result for ``seconds``.
+
+    Entries are keyed by the function's qualified name and arguments, so
+    helpers that are redefined on every request still share one entry.
+    """
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            key = (name, args)
+            now = time.monotonic()
+            with _ttl_cache_lock:
+                entry = _ttl_cache_entries.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            value = fn(*args)
+            with _ttl_cache_lock:
+                _ttl_cache_entries[key] = (value, now + seconds)
+            return value
+        return wrapper
+    return decorator
+
+# Heavy modules used only by the debug probes, imported on first use
+@functools.cache
+def _moviepy_editor():
+    import moviepy.editor
+    return moviepy.editor
+
+@functools.cache
+def _numpy():
+    import numpy
+    return numpy
+
+@functools.cache
+def _pil_image():
+    from PIL import Image
+    return Image
+
+def ojson(obj, status=200):
+    """Serialize ``obj`` with orjson; used for the large debug payloads."""
+    return app.response_class(orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS),
+                              status=status, mimetype='application/json')
+
 def debug_info():
     """Debug endpoint to check environment and dependencies."""
     try:
-        debug_data = {
-            'python_version': sys.version,
-            'python_path': sys.path,
-            'current_directory': os.getcwd(),
-            'environment_variables': dict(os.environ),
-            'installed_packages': [],
-            'ffmpeg_check': None,
-            'file_structure': {}
-        }
+        return ojson(collect_debug_info())
         
-        # Check installed packages
-        try:
-            result = subprocess.run([sys.executable, '-m', 'pip', 'list'], 
-                                  capture_output=True, text=True, timeout=30)
-            debug_data['installed_packages'] = result.stdout.split('\n')
-        except Exception as e:
-            debug_data['installed_packages'] = f'Error getting packages: {str(e)}'
-        
-        # Check FFmpeg
-        try:
-            result = subprocess.run(['ffmpeg', '-version'], 
-                                  capture_output=True, text=True, timeout=10)
-            debug_data['ffmpeg_check'] = 'FFmpeg available'
-        except Exception as e:
-            debug_data['ffmpeg_check'] = f'FFmpeg not available: {str(e)}'
-        
-        # Check file structure
+    except Exception as e:
+         return ojson({'error': f'Debug endpoint error: {str(e)}'}, 500)
+
+@functools.cache
+def scan_file_structure(current_dir):
+    """Map each directory under ``current_dir``, three levels deep, to its first entries.
+
+    The deployed tree does not change while the process runs (it is
+    read-only on Vercel), so the result is kept for the process lifetime.
+    """
+    file_structure = {}
+    # Breadth-first, three levels deep; children of the last level are never
+    # queued, and symlinked directories are listed but not followed (as os.walk)
+    queue = deque([(current_dir, 0)])
+    while queue:
+        root, level = queue.popleft()
+        dirs, files, subdirs = [], [], []
         try:
-            current_dir = os.getcwd()
-            for root, dirs, files in os.walk(current_dir):
-                # Limit depth to avoid too much data
-                level = root.replace(current_dir, '').count(os.sep)
-                if level < 3:
-                    rel_path = os.path.relpath(root, current_dir)
-                    debug_data['file_structure'][rel_path] = {
-                        'dirs': dirs[:10],  # Limit to first 10
-                        'files': files[:10]  # Limit to first 10
-                    }
-        except Exception as e:
-            debug_data['file_structure'] = f'Error reading file structure: {str(e)}'
-        
-        return jsonify(debug_data)
-        
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        dirs.append(entry.name)
+                        if level < 2 and not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            continue  # unreadable directories were skipped by os.walk too
+        rel_path = os.path.relpath(root, current_dir)
+        file_structure[rel_path] = {
+            'dirs': dirs[:10],  # Limit to first 10
+            'files': files[:10]  # Limit to first 10
+        }
+        queue.extend((path, level + 1) for path in subdirs)
+    return file_structure
+
+@ttl_cache(DEBUG_CACHE_TTL)
+def collect_debug_info():
+    """Gather the /debug payload; shelling out to pip and ffmpeg is slow."""
+    debug_data = {
+        'python_version': sys.version,
+        'python_path': sys.path,
+        'current_directory': os.getcwd(),
+        'environment_variables': dict(os.environ),
+        'installed_packages': [],
+        'ffmpeg_check': None,
+        'file_structure': {}
+    }
+    
+    # Check installed packages
+    try:
+        result = subprocess.run([sys.executable, '-m', 'pip', 'list'], 
+                              capture_output=True, text=True, timeout=30)
+        debug_data['installed_packages'] = result.stdout.split('\n')
+    except Exception as e:
+        debug_data['installed_packages'] = f'Error getting packages: {str(e)}'
+    
+    # Check FFmpeg
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], 
+                              capture_output=True, text=True, timeout=10)
+        debug_data['ffmpeg_check'] = 'FFmpeg available'
+    except Exception as e:
+        debug_data['ffmpeg_check'] = f'FFmpeg not available: {str(e)}'
+    
+    # Check file structure
+    try:
+        debug_data['file_structure'] = scan_file_structure(os.getcwd())
     except Exception as e:
-         return jsonify({'error': f'Debug endpoint error: {str(e)}'}), 500
+        debug_data['file_structure'] = f'Error reading file structure: {str(e)}'
+    
+    return debug_data
 
-@app.route('/debug/moviepy')
 def debug_moviepy():
     """Comprehensive MoviePy and FFmpeg test endpoint."""
-    import traceback
-    import json
-    from io import BytesIO
-    import numpy as np
-    from PIL import Image
-    import subprocess
-    import platform
-    import sys
-    import pkg_resources
-    import logging
     
     # Configure logging
     logging.basicConfig(level=logging.INFO)
@@ -407,6 +1341,7 @@ def debug_moviepy():
         logger.error(json.dumps(error_info, indent=2))
         return error_info
     
+    @ttl_cache(DEBUG_CACHE_TTL)
     def get_system_info():
         """Collect system and environment information."""
         return {
@@ -416,22 +1351,25 @@ def debug_moviepy():
             'path': sys.path,
             'environment': {k: v for k, v in os.environ.items() 
                           if k in ('PATH', 'LD_LIBRARY_PATH', 'PYTHONPATH', 'VERCEL')},
-            'installed_packages': sorted([f"{p.project_name}=={p.version}" 
-                                      for p in pkg_resources.working_set])
+            'installed_packages': sorted(f"{d.metadata['Name']}=={d.version}"
+                                         for d in distributions())
         }
     
+    @ttl_cache(DEBUG_CACHE_TTL)
     def test_ffmpeg():
         """Test FFmpeg installation and functionality."""
         result = {'status': 'not_tested'}
         try:
             # Check if ffmpeg is in PATH
-            ffmpeg_path = subprocess.check_output(['which', 'ffmpeg'], 
-                                               stderr=subprocess.STDOUT).decode().strip()
+            ffmpeg_path = shutil.which('ffmpeg')
+            if ffmpeg_path is None:
+                result['status'] = 'ffmpeg not found'
+                return result
             result['path'] = ffmpeg_path
             
             # Get version
             version_output = subprocess.check_output(
-                ['ffmpeg', '-version'], 
+                [ffmpeg_path, '-version'], 
                 stderr=subprocess.STDOUT
             ).decode('utf-8', errors='replace')
             
@@ -439,7 +1377,7 @@ def debug_moviepy():
             
             # Check codecs
             codec_output = subprocess.check_output(
-                ['ffmpeg', '-codecs'], 
+                [ffmpeg_path, '-codecs'], 
                 stderr=subprocess.STDOUT
             ).decode('utf-8', errors='replace')
             
@@ -459,7 +1397,7 @@ def debug_moviepy():
                 f.write("file 'test_input.txt'\nduration 1\nfile 'test_input.txt'")
             
             ffmpeg_cmd = [
-                'ffmpeg',
+                ffmpeg_path,
                 '-f', 'lavfi',
                 '-i', 'testsrc=duration=1:size=320x240:rate=30',
                 '-c:v', 'libx264',
@@ -496,6 +1434,7 @@ def debug_moviepy():
             
         return result
     
+    @ttl_cache(DEBUG_CACHE_TTL)
     def test_moviepy():
         """Test MoviePy functionality."""
         result = {'status': 'not_tested'}
@@ -506,7 +1445,9 @@ def debug_moviepy():
             result['version'] = getattr(moviepy, '__version__', 'unknown')
             
             # Test basic imports
-            from moviepy.editor import VideoFileClip, AudioFileClip, ImageClip, ColorClip, concatenate_videoclips
+            editor = _moviepy_editor()
+            np = _numpy()
+            Image = _pil_image()
             result['imports'] = 'success'
             
             # Create test directory
@@ -515,7 +1456,7 @@ def debug_moviepy():
             
             # Test 1: Create and save a simple color clip
             try:
-                clip = ColorClip((320, 240), color=(255, 0, 0), duration=1)
+                clip = editor.ColorClip((320, 240), color=(255, 0, 0), duration=1)
                 test_video = os.path.join(test_dir, 'test_color.mp4')
                 clip.write_videofile(
                     test_video, 
@@ -533,7 +1474,7 @@ def debug_moviepy():
             
             # Test 2: Create and save an audio clip
             try:
-                audio = AudioClip(
+                audio = editor.AudioClip(
                     lambda t: [np.sin(440 * 2 * np.pi * t)],
                     duration=1,
                     fps=44100
@@ -559,7 +1500,7 @@ def debug_moviepy():
                 img.save(img_byte_arr, format='PNG')
                 img_byte_arr = img_byte_arr.getvalue()
                 
-                image_clip = ImageClip(img_byte_arr).set_duration(1)
+                image_clip = editor.ImageClip(img_byte_arr).set_duration(1)
                 test_image_video = os.path.join(test_dir, 'test_image.mp4')
                 image_clip.write_videofile(
                     test_image_video,
@@ -645,17 +1586,16 @@ def debug_moviepy():
             logger.warning(f"Cleanup failed: {str(e)}")
         
         logger.info("Debug endpoint execution completed successfully")
-        return jsonify(results)
+        return ojson(results)
         
     except Exception as e:
-        return jsonify({'error': f'MoviePy debug error: {str(e)}'}), 500
+        return ojson({'error': f'MoviePy debug error: {str(e)}'}, 500)
 
-@app.route('/api/debug-public')
 def debug_public():
     """Public debug endpoint that bypasses authentication."""
     try:
         debug_info = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.datetime.now().isoformat(),
             'python_version': sys.version,
             'working_directory': os.getcwd(),
             'moviepy_status': 'checking...',
@@ -684,24 +1624,63 @@ def debug_public():
         except ImportError as e:
             debug_info['video_processor_status'] = f'FAILED - {str(e)}'
         
-        return jsonify(debug_info)
+        return ojson(debug_info)
         
     except Exception as e:
-        return jsonify({'error': f'Debug error: {str(e)}', 'timestamp': datetime.now().isoformat()}), 500
+        return ojson({'error': f'Debug error: {str(e)}', 'timestamp': datetime.datetime.now().isoformat()}, 500)
  
 
-def find_free_port(start_port=5001):
-    """Find a free port starting from start_port."""
+# The debug endpoints dump the environment and run ffmpeg/MoviePy probes, so
+# they are only routed when explicitly enabled.
+if os.environ.get('ENABLE_DEBUG_ROUTES', '').lower() in ('1', 'true', 'yes'):
+    app.add_url_rule('/debug', view_func=debug_info)
+    app.add_url_rule('/debug/moviepy', view_func=debug_moviepy)
+    app.add_url_rule('/api/debug-public', view_func=debug_public)
+
+def find_free_port(start_port=None):
+    """Return a free port, preferring start_port if given and available.
+
+    Without a usable preference the OS picks an ephemeral port, so this is
+    at most two bind() calls.
+    """
     import socket
-    for port in range(start_port, start_port + 100):
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        # Ports in TIME_WAIT from a previous run still count as free. Windows
+        # would let us bind over a live listener with this flag, so skip it there.
+        if os.name != 'nt':
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        for port in ((start_port, 0) if start_port else (0,)):
+            try:
                 s.bind(('localhost', port))
-                return port
-        except OSError:
-            continue
+            except OSError:
+                continue
+            return s.getsockname()[1]
     return None
 
+# Request threads for waitress. Every open progress stream occupies one for
+# up to PROGRESS_STREAM_MAX_AGE, so keep this well above the number of
+# browser tabs expected to watch jobs at once.
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 0)) or 32
+
+def serve_app(host, port, debug=False):
+    """Serve the app under waitress, or Flask's development server without it.
+
+    waitress handles requests on a pool of threads, so progress polls and
+    SSE streams are not queued behind uploads being parsed. The debug
+    reloader and debugger need the development server.
+    """
+    start_warmup()
+    if not debug:
+        try:
+            from waitress import serve
+        except ImportError:
+            pass
+        else:
+            serve(app, host=host, port=port, threads=SERVER_THREADS,
+                  max_request_body_size=UPLOAD_MAX_BYTES)
+            return
+    app.run(host=host, port=port, debug=debug, threaded=True)
+
 def main():
     """Main function to run the web GUI."""
     print("ImageToVideo Web GUI")
@@ -717,19 +1696,25 @@ def main():
     print("The web interface will open automatically in your browser.")
     print("Press Ctrl+C to stop the server.\n")
     
-    # Open browser after a short delay
+    # Open the browser as soon as the server accepts connections (give up
+    # waiting after 5 seconds and open it anyway)
     def open_browser():
-        import time
-        time.sleep(1.5)
+        import socket
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('localhost', port), timeout=0.05).close()
+                break
+            except OSError:
+                time.sleep(0.05)
         webbrowser.open(f'http://localhost:{port}')
     
     browser_thread = threading.Thread(target=open_browser)
     browser_thread.daemon = True
     browser_thread.start()
     
-    # Run the Flask app
     try:
-        app.run(host='localhost', port=port, debug=False)
+        serve_app('localhost', port)
     except Exception as e:
         print(f"❌ Error starting server: {e}")
         print("💡 Try running with a different port or check if another service is using the port.")
@@ -739,9 +1724,10 @@ if __name__ == '__main__':
     if os.environ.get('PORT'):
         # Production mode - use environment variables
         port = int(os.environ.get('PORT', 5000))
-        debug = os.environ.get('FLASK_ENV') != 'production'
+        # The debugger must never face the network unless explicitly asked for
+        debug = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
         print(f"🚀 Starting in production mode on port {port}")
-        app.run(host='0.0.0.0', port=port, debug=debug)
+        serve_app('0.0.0.0', port, debug=debug)
     else:
         # Development mode - use local setup
         main()
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""Green screen kernels used by VideoProcessor.
+
+has_green_pixels(frame, needed) tells whether a frame has at least needed
+green pixels. It stops scanning as soon as the answer is settled either way.
+
+The numba kernels are compiled for fixed signatures and cached to
+__pycache__, so a deployment that ships that directory pays the compile
+time once rather than on every cold start. They live in their own module
+because numba keys the cache on the source file; edits elsewhere in the
+video processor then leave it valid.
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # numba is optional; the numpy kernels give the same answers
+    numba = None
+
+
+# Green screen test, solved from the HSV window the detector has always used
+# (hue 0.222-0.444, saturation and value >= 0.196) into integer comparisons
+# on the uint8 channels:
+#   value:      g >= 50                                  (max channel is g)
+#   saturation: 250 * (g - min(r, b)) >= 49 * g
+#   hue:        250 * (r - b) < 167 * d  and  125 * (b - r) <= 83 * d
+# with d = g - min(r, b), and g >= r, g > b so that green is the max channel.
+# This selects exactly the same colours as the float HSV computation did.
+
+def _count_green_pixels(frame: np.ndarray) -> int:
+    r = frame[:, :, 0].astype(np.int32)
+    g = frame[:, :, 1].astype(np.int32)
+    b = frame[:, :, 2].astype(np.int32)
+    d = g - np.minimum(r, b)
+    mask = (g >= r) & (g > b) & (g >= 50)
+    mask &= 250 * d >= 49 * g
+    mask &= 250 * (r - b) < 167 * d
+    mask &= 125 * (b - r) <= 83 * d
+    return int(np.count_nonzero(mask))
+
+# Rows counted per step by the numpy kernel between early-exit checks
+_BAND_ROWS = 64
+
+def has_green_pixels_numpy(frame: np.ndarray, needed: int) -> bool:
+    height, width = frame.shape[0], frame.shape[1]
+    count = 0
+    for y in range(0, height, _BAND_ROWS):
+        count += _count_green_pixels(frame[y:y + _BAND_ROWS])
+        remaining = (height - y - _BAND_ROWS) * width
+        if count >= needed:
+            return True
+        if count + max(remaining, 0) < needed:
+            return False
+    return count >= needed
+
+def has_green_pixels_batch_numpy(frames: np.ndarray, needed: int) -> np.ndarray:
+    return np.array([has_green_pixels_numpy(frame, needed) for frame in frames], dtype=np.bool_)
+
+if numba is not None:
+    @numba.njit(inline='always', cache=True)
+    def _is_green_pixel(r, g, b):
+        d = g - min(r, b)
+        return (g >= r and g > b and g >= 50 and 250 * d >= 49 * g
+                and 250 * (r - b) < 167 * d and 125 * (b - r) <= 83 * d)
+
+    # Frames must be C-contiguous H x W x 3 (or N x H x W x 3) uint8 arrays.
+    # Rows are scanned in order so the answer can be returned as soon as it
+    # is settled; the inner loop over a row is left for LLVM to vectorize.
+    @numba.njit("boolean(uint8[:, :, ::1], int64)", fastmath=True, cache=True)
+    def has_green_pixels(frame, needed):
+        height, width = frame.shape[0], frame.shape[1]
+        count = 0
+        for y in range(height):
+            row = 0
+            for x in range(width):
+                if _is_green_pixel(np.int32(frame[y, x, 0]), np.int32(frame[y, x, 1]), np.int32(frame[y, x, 2])):
+                    row += 1
+            count += row
+            if count >= needed:
+                return True
+            if count + (height - y - 1) * width < needed:
+                return False
+        return count >= needed
+
+    @numba.njit("boolean[::1](uint8[:, :, :, ::1], int64)", parallel=True, cache=True)
+    def has_green_pixels_batch(frames, needed):
+        flags = np.zeros(frames.shape[0], dtype=np.bool_)
+        for n in numba.prange(frames.shape[0]):
+            flags[n] = has_green_pixels(frames[n], needed)
+        return flags
+else:
+    has_green_pixels = has_green_pixels_numpy
+    has_green_pixels_batch = has_green_pixels_batch_numpy
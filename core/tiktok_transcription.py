@@ -5,24 +5,160 @@ Handles downloading TikTok videos and transcribing them using Deepgram.
 """
 
 import os
+import asyncio
 import tempfile
+import shutil
 import subprocess
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+import httpx
 from deepgram import DeepgramClient, PrerecordedOptions
+try:
+    import yt_dlp
+except ImportError:  # fall back to the yt-dlp command line tool
+    yt_dlp = None
+try:
+    from yt_dlp.networking import Request
+except ImportError:  # yt-dlp releases before the networking framework
+    from urllib.request import Request
 from .deepgram_config import get_deepgram_api_key, get_deepgram_config
 
+DEEPGRAM_API_URL = "https://api.deepgram.com"
+DEEPGRAM_LISTEN_URL = DEEPGRAM_API_URL + "/v1/listen"
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# PrerecordedOptions fields taken from DEEPGRAM_CONFIG
+_OPTION_KEYS = ("model", "language", "smart_format", "punctuate", "diarize", "utterances")
+
+# Downloads are converted straight to 16 kHz mono 16-bit PCM: plenty for
+# speech, and no lossy encode that Deepgram would only decode again
+_PCM_ARGS = ["-ac", "1", "-ar", "16000", "-sample_fmt", "s16"]
+
+# Optional Netscape cookie file for TikTok, so every download presents the
+# same session instead of each one collecting fresh cookies
+TIKTOK_COOKIES_FILE = os.environ.get('TIKTOK_COOKIES_FILE')
+
+# Options for the cached YoutubeDL instances; outtmpl is set per download
+_YDL_OPTS = {
+    'format': 'bestaudio/best',
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'wav',
+    }],
+    'postprocessor_args': {'extractaudio': _PCM_ARGS},
+    'quiet': True,
+    'no_warnings': True,
+    'noprogress': True,
+}
+if TIKTOK_COOKIES_FILE:
+    _YDL_OPTS['cookiefile'] = TIKTOK_COOKIES_FILE
+
+class _KeepAliveTransport(httpx.HTTPTransport):
+    """HTTP transport that outlives the httpx.Client wrapped around it.
+
+    The Deepgram SDK opens a new ``httpx.Client`` for every request and
+    closes it afterwards; handing it this transport keeps the connection
+    pool, and so the TLS session to Deepgram, alive between requests.
+    """
+
+    def __exit__(self, *args):
+        pass
+
+def _pump(source, sink, errors):
+    """Copy source into sink, then close sink; read errors are appended to errors."""
+    try:
+        shutil.copyfileobj(source, sink, STREAM_CHUNK_SIZE)
+    except BrokenPipeError:
+        pass  # the reader exited; its exit status tells why
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            sink.close()
+        except OSError:
+            pass
+
+class _KeepAliveAsyncTransport(httpx.AsyncHTTPTransport):
+    """Async counterpart of _KeepAliveTransport; close it with aclose()."""
+
+    async def __aexit__(self, *args):
+        pass
+
+async def _aread_chunks(path):
+    """Yield a file's contents in chunks, reading off the event loop."""
+    audio_file = await asyncio.to_thread(open, path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(audio_file.read, STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        audio_file.close()
+
 class TikTokTranscriber:
-    def __init__(self):
+    def __init__(self, stream_upload=False):
         self.api_key = get_deepgram_api_key()
         self.config = get_deepgram_config()
+        # Built once and reused for every transcription
+        self._deepgram = DeepgramClient(self.api_key)
+        self._options = PrerecordedOptions(**{key: self.config[key] for key in _OPTION_KEYS})
+        self._stream_params = {key: self.config[key] for key in _OPTION_KEYS}
+        self._stream_params.update(encoding="linear16", sample_rate=16000, channels=1)
+        self._transport = _KeepAliveTransport(limits=httpx.Limits(max_keepalive_connections=8))
+        # Async connections belong to the event loop that opened them, so the
+        # async pool is kept per loop; see _get_async_transport
+        self._async_transport = None
+        self._async_transport_loop = None
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        # Downloads land here under unique names; removed at interpreter exit
+        self._scratch = tempfile.TemporaryDirectory(prefix="dv_tt_")
+        # Pipe audio through ffmpeg straight into the Deepgram request
+        self.stream_upload = stream_upload
+        self._local = threading.local()
     
-    def download_tiktok_video(self, url, output_dir=None):
+    def _get_ydl(self):
+        """Return this thread's YoutubeDL; an instance is only ever used by one thread."""
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = self._local.ydl = yt_dlp.YoutubeDL(_YDL_OPTS)
+        return ydl
+    
+    def _warm_deepgram(self):
+        """Open a connection to Deepgram so DNS, TCP and TLS are done before the upload."""
+        try:
+            with httpx.Client(transport=self._transport, timeout=2) as client:
+                client.head(DEEPGRAM_API_URL)
+        except httpx.HTTPError:
+            pass  # the real request will connect on its own
+    
+    def _get_async_transport(self):
+        """Return the Deepgram connection pool for the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        if self._async_transport_loop is not loop:
+            self._async_transport = _KeepAliveAsyncTransport(limits=httpx.Limits(max_keepalive_connections=8))
+            self._async_transport_loop = loop
+        return self._async_transport
+    
+    async def _awarm_deepgram(self, transport):
+        """Async counterpart of _warm_deepgram."""
+        try:
+            async with httpx.AsyncClient(transport=transport, timeout=2) as client:
+                await client.head(DEEPGRAM_API_URL)
+        except httpx.HTTPError:
+            pass
+    
+    def download_tiktok_video(self, url, output_dir=None, filename="tiktok_video"):
         """
         Download TikTok video using yt-dlp.
         
         Args:
             url (str): TikTok video URL
             output_dir (str): Directory to save the video (optional)
+            filename (str): File name to save under, without extension (optional)
             
         Returns:
             str: Path to downloaded video file
@@ -34,71 +170,176 @@ class TikTokTranscriber:
         os.makedirs(output_dir, exist_ok=True)
         
         # Output template for yt-dlp
-        output_template = os.path.join(output_dir, "tiktok_video.%(ext)s")
+        output_template = os.path.join(output_dir, f"{filename}.%(ext)s")
+        
+        if yt_dlp is None:
+            return self._download_with_cli(url, output_dir, output_template, filename)
+        
+        try:
+            # Download in-process; no interpreter start-up or output globbing
+            ydl = self._get_ydl()
+            ydl.params['outtmpl'] = {'default': output_template}
+            info = ydl.extract_info(url, download=True)
+            downloads = info.get('requested_downloads') or []
+            if downloads and downloads[-1].get('filepath'):
+                return downloads[-1]['filepath']
+            return os.path.splitext(ydl.prepare_filename(info))[0] + '.wav'
+                
+        except yt_dlp.utils.DownloadError as e:
+            raise Exception(f"Failed to download TikTok video: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Error downloading TikTok video: {str(e)}")
+    
+    def download_tiktok_audio_bytes(self, url):
+        """
+        Fetch the best audio stream of a TikTok video straight into memory.
+        
+        Args:
+            url (str): TikTok video URL
+            
+        Returns:
+            bytes: The raw audio stream, or None if it can't be fetched as a
+            single HTTP download (use download_tiktok_video instead)
+        """
+        if yt_dlp is None:
+            return None
         
+        try:
+            response = self._open_audio_stream(url)
+            if response is None:
+                return None
+            with response:
+                return response.read()
+        except Exception:
+            return None
+    
+    def _open_audio_stream(self, url):
+        """Open the best audio stream of a TikTok video, or return None if it isn't plain HTTP."""
+        ydl = self._get_ydl()
+        info = ydl.extract_info(url, download=False)
+        if info.get('protocol', 'https') not in ('http', 'https') or not info.get('url'):
+            return None
+        # Same YoutubeDL instance, so the extractor's cookies are sent too
+        request = Request(info['url'], headers=info.get('http_headers') or {})
+        return ydl.urlopen(request)
+    
+    def transcribe_tiktok_stream(self, url):
+        """
+        Download, convert and transcribe a TikTok video's audio in one pass.
+        
+        The audio stream is piped through ffmpeg to 16 kHz mono PCM and
+        ffmpeg's output is posted to Deepgram as it is produced, so the
+        upload overlaps the download instead of following it.
+        
+        Args:
+            url (str): TikTok video URL
+            
+        Returns:
+            dict: Transcription result from Deepgram, or None if the audio
+            isn't a single HTTP stream (use transcribe_tiktok_url instead)
+        """
+        if yt_dlp is None:
+            return None
+        
+        try:
+            response = self._open_audio_stream(url)
+        except Exception:
+            return None
+        if response is None:
+            return None
+        
+        with response:
+            ffmpeg = subprocess.Popen(
+                ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", *_PCM_ARGS, "-f", "s16le", "pipe:1"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            errors = []
+            feeder = threading.Thread(target=_pump, args=(response, ffmpeg.stdin, errors), daemon=True)
+            feeder.start()
+            try:
+                with httpx.Client(transport=self._transport, timeout=httpx.Timeout(30, read=300)) as client:
+                    result = client.post(
+                        DEEPGRAM_LISTEN_URL,
+                        params=self._stream_params,
+                        headers={"Authorization": f"Token {self.api_key}"},
+                        content=iter(lambda: ffmpeg.stdout.read(STREAM_CHUNK_SIZE), b"")
+                    )
+            except BaseException:
+                ffmpeg.kill()
+                raise
+            finally:
+                ffmpeg.stdout.close()
+                ffmpeg.wait()
+            feeder.join()
+    
+        if errors:
+            raise Exception(f"Error downloading TikTok video: {str(errors[0])}")
+        if ffmpeg.returncode != 0:
+            raise Exception(f"ffmpeg exited with status {ffmpeg.returncode}")
+        result.raise_for_status()
+        return result.json()
+    
+    def _download_with_cli(self, url, output_dir, output_template, filename):
+        """Download with the yt-dlp executable when the module isn't importable."""
         try:
             # Use yt-dlp to download the video
             cmd = [
                 "yt-dlp",
                 "--extract-audio",
-                "--audio-format", "mp3",
+                "--audio-format", "wav",
+                "--postprocessor-args", "ExtractAudio:" + " ".join(_PCM_ARGS),
                 "--output", output_template,
                 url
             ]
+            if TIKTOK_COOKIES_FILE:
+                cmd[1:1] = ["--cookies", TIKTOK_COOKIES_FILE]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            # Only stderr is kept, for the error message
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
             
             # Find the downloaded file
-            downloaded_files = list(Path(output_dir).glob("tiktok_video.*"))
+            downloaded_files = list(Path(output_dir).glob(f"{filename}.*"))
             if not downloaded_files:
                 raise Exception("No file was downloaded")
             
             return str(downloaded_files[0])
             
         except subprocess.CalledProcessError as e:
-            raise Exception(f"Failed to download TikTok video: {e.stderr}")
+            raise Exception(f"Failed to download TikTok video: {e.stderr.decode('utf-8', 'replace')}")
         except Exception as e:
             raise Exception(f"Error downloading TikTok video: {str(e)}")
     
-    def transcribe_audio(self, audio_path):
+    def transcribe_audio(self, audio):
         """
-        Transcribe audio file using Deepgram SDK.
+        Transcribe audio using Deepgram SDK.
         
         Args:
-            audio_path (str): Path to audio file
+            audio (str or bytes): Path to audio file, or the audio itself
             
         Returns:
             dict: Transcription result from Deepgram
         """
         try:
-            # Initialize Deepgram client
-            deepgram = DeepgramClient(self.api_key)
-            
-            # Configure options
-            options = PrerecordedOptions(
-                model=self.config["model"],
-                language=self.config["language"],
-                smart_format=self.config["smart_format"],
-                punctuate=self.config["punctuate"],
-                diarize=self.config["diarize"],
-                utterances=self.config["utterances"]
-            )
-            
-            # Read audio file
-            with open(audio_path, "rb") as audio_file:
-                buffer_data = audio_file.read()
-            
-            # Transcribe audio
-            response = deepgram.listen.prerecorded.v("1").transcribe_file(
-                {"buffer": buffer_data},
-                options
-            )
+            if isinstance(audio, (bytes, bytearray)):
+                return self._transcribe_source({"buffer": audio})
             
-            return response.to_dict()
+            # Files are streamed from disk in chunks rather than read whole
+            with open(audio, "rb") as audio_file:
+                return self._transcribe_source({"stream": audio_file})
             
         except Exception as e:
             raise Exception(f"Error transcribing audio: {str(e)}")
     
+    def _transcribe_source(self, source):
+        """Send a Deepgram buffer or stream source with the cached client and options."""
+        response = self._deepgram.listen.prerecorded.v("1").transcribe_file(
+            source,
+            self._options,
+            transport=self._transport
+        )
+        return response.to_dict()
+    
     def extract_text_from_transcription(self, transcription_result):
         """
         Extract plain text from Deepgram transcription result.
@@ -107,69 +348,178 @@ class TikTokTranscriber:
             transcription_result (dict): Result from Deepgram API
             
         Returns:
-            str: Extracted text
+            str: Extracted text, or None if the result holds no transcript
+        """
+        try:
+            transcript = transcription_result["results"]["channels"][0]["alternatives"][0]["transcript"]
+        except (KeyError, IndexError, TypeError):
+            return None
+        return (transcript or "").strip() or None
+    
+    def _build_result(self, url, transcription_result, include_full_result):
+        """Build the result dict for a successful transcription."""
+        text = self.extract_text_from_transcription(transcription_result)
+        if text is None:
+            text = "No text found in transcription."
+        
+        result = {
+            "success": True,
+            "text": text,
+            "url": url
+        }
+        if include_full_result:
+            result["full_result"] = transcription_result
+        return result
+    
+    def transcribe_tiktok_url(self, url, progress_callback=None, include_full_result=False):
+        """
+        Complete workflow: download TikTok video and transcribe it.
+        
+        Args:
+            url (str): TikTok video URL
+            progress_callback (callable): Optional callback for progress updates
+            include_full_result (bool): Also return Deepgram's raw response as "full_result"
+            
+        Returns:
+            dict: Result containing transcription text and metadata
         """
+        audio_path = None
         try:
-            if "results" not in transcription_result:
-                return "No transcription results found."
+            if progress_callback:
+                progress_callback("Downloading TikTok video...", 10)
             
-            channels = transcription_result["results"].get("channels", [])
-            if not channels:
-                return "No audio channels found in transcription."
+            # Connect to Deepgram while the download runs
+            warm_up = self._executor.submit(self._warm_deepgram)
             
-            alternatives = channels[0].get("alternatives", [])
-            if not alternatives:
-                return "No transcription alternatives found."
+            transcription_result = None
+            if self.stream_upload:
+                transcription_result = self.transcribe_tiktok_stream(url)
             
-            transcript = alternatives[0].get("transcript", "")
-            return transcript.strip() if transcript else "No text found in transcription."
+            if transcription_result is None:
+                # Fetch the audio into memory; fall back to downloading and
+                # converting it in the scratch directory
+                audio = self.download_tiktok_audio_bytes(url)
+                if audio is None:
+                    audio = audio_path = self.download_tiktok_video(
+                        url, self._scratch.name, filename=uuid.uuid4().hex
+                    )
+                
+                if progress_callback:
+                    progress_callback("Video downloaded, starting transcription...", 50)
+                
+                # Transcribe audio
+                warm_up.result()
+                transcription_result = self.transcribe_audio(audio)
+            
+            if progress_callback:
+                progress_callback("Transcription completed, extracting text...", 90)
+            
+            result = self._build_result(url, transcription_result, include_full_result)
+            
+            if progress_callback:
+                progress_callback("Transcription process completed!", 100)
+            
+            return result
             
         except Exception as e:
-            return f"Error extracting text: {str(e)}"
+            error_msg = f"Error in TikTok transcription: {str(e)}"
+            if progress_callback:
+                progress_callback(error_msg, 0)
+            
+            return {
+                "success": False,
+                "error": error_msg,
+                "url": url
+            }
+            
+        finally:
+            # Remove the downloaded file; the scratch directory is kept
+            if audio_path:
+                try:
+                    os.unlink(audio_path)
+                except OSError:
+                    pass
+
+    def transcribe_tiktok_urls(self, urls, max_workers=8, progress_callback=None, include_full_result=False):
+        """
+        Transcribe several TikTok videos concurrently.
+        
+        Downloads and Deepgram requests for different URLs overlap; all
+        workers share this transcriber's Deepgram client and connections.
+        
+        Args:
+            urls (list): TikTok video URLs
+            max_workers (int): Maximum number of videos processed at once
+            progress_callback (callable): Optional callback, called as each video finishes
+            include_full_result (bool): Also return Deepgram's raw responses
+            
+        Yields:
+            dict: One result per URL (as returned by transcribe_tiktok_url),
+            in completion order; each result carries its "url"
+        """
+        urls = list(urls)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self.transcribe_tiktok_url, url, include_full_result=include_full_result) for url in urls]
+            for done, future in enumerate(as_completed(futures), 1):
+                if progress_callback:
+                    progress_callback(f"Transcribed {done} of {len(urls)} videos", done * 100 // len(urls))
+                yield future.result()
     
-    def transcribe_tiktok_url(self, url, progress_callback=None):
+    async def atranscribe_tiktok_url(self, url, include_full_result=False, transport=None, progress_callback=None):
         """
-        Complete workflow: download TikTok video and transcribe it.
+        Async variant of transcribe_tiktok_url.
+        
+        yt-dlp runs in a worker thread and the Deepgram request is awaited,
+        so one event loop can drive many transcriptions at once.
         
         Args:
             url (str): TikTok video URL
+            include_full_result (bool): Also return Deepgram's raw response as "full_result"
+            transport (httpx.AsyncHTTPTransport): Connection pool for the Deepgram request
+                (default: the transcriber's pool for the running loop)
             progress_callback (callable): Optional callback for progress updates
             
         Returns:
             dict: Result containing transcription text and metadata
         """
-        temp_dir = None
+        if transport is None:
+            transport = self._get_async_transport()
+        audio_path = None
+        warm_up = None
         try:
-            # Create temporary directory
-            temp_dir = tempfile.mkdtemp()
-            
             if progress_callback:
                 progress_callback("Downloading TikTok video...", 10)
             
-            # Download video
-            audio_path = self.download_tiktok_video(url, temp_dir)
+            # Connect to Deepgram while the download runs
+            warm_up = asyncio.create_task(self._awarm_deepgram(transport))
+            
+            audio = await asyncio.to_thread(self.download_tiktok_audio_bytes, url)
+            if audio is None:
+                audio_path = await asyncio.to_thread(
+                    self.download_tiktok_video, url, self._scratch.name, uuid.uuid4().hex
+                )
+            # Files are streamed from disk in chunks rather than read whole
+            source = {"buffer": audio} if audio is not None else {"stream": _aread_chunks(audio_path)}
             
             if progress_callback:
                 progress_callback("Video downloaded, starting transcription...", 50)
             
-            # Transcribe audio
-            transcription_result = self.transcribe_audio(audio_path)
+            await warm_up
+            response = await self._deepgram.listen.asyncprerecorded.v("1").transcribe_file(
+                source,
+                self._options,
+                transport=transport
+            )
             
             if progress_callback:
                 progress_callback("Transcription completed, extracting text...", 90)
             
-            # Extract text
-            text = self.extract_text_from_transcription(transcription_result)
+            result = self._build_result(url, response.to_dict(), include_full_result)
             
             if progress_callback:
                 progress_callback("Transcription process completed!", 100)
             
-            return {
-                "success": True,
-                "text": text,
-                "url": url,
-                "full_result": transcription_result
-            }
+            return result
             
         except Exception as e:
             error_msg = f"Error in TikTok transcription: {str(e)}"
@@ -183,24 +533,52 @@ class TikTokTranscriber:
             }
             
         finally:
-            # Clean up temporary directory
-            if temp_dir and os.path.exists(temp_dir):
-                import shutil
+            if warm_up is not None and not warm_up.done():
+                warm_up.cancel()
+            if audio_path:
                 try:
-                    shutil.rmtree(temp_dir)
-                except:
-                    pass  # Ignore cleanup errors
+                    os.unlink(audio_path)
+                except OSError:
+                    pass
+    
+    async def atranscribe_tiktok_urls(self, urls, include_full_result=False):
+        """
+        Transcribe several TikTok videos concurrently on the running event loop.
+        
+        All of them share the transcriber's connection pool for this loop.
+        
+        Args:
+            urls (list): TikTok video URLs
+            include_full_result (bool): Also return Deepgram's raw responses
+            
+        Returns:
+            list: One result per URL, in the order of urls
+        """
+        return await asyncio.gather(*[
+            self.atranscribe_tiktok_url(url, include_full_result) for url in urls
+        ])
+
+_transcriber = None
+_transcriber_lock = threading.Lock()
+
+def get_transcriber():
+    """Return the process-wide TikTokTranscriber, creating it on first use."""
+    global _transcriber
+    with _transcriber_lock:
+        if _transcriber is None:
+            _transcriber = TikTokTranscriber()
+        return _transcriber
 
-def transcribe_tiktok_video(url, progress_callback=None):
+def transcribe_tiktok_video(url, progress_callback=None, include_full_result=False):
     """
     Convenience function to transcribe a TikTok video.
     
     Args:
         url (str): TikTok video URL
         progress_callback (callable): Optional callback for progress updates
+        include_full_result (bool): Also return Deepgram's raw response as "full_result"
         
     Returns:
         dict: Transcription result
     """
-    transcriber = TikTokTranscriber()
-    return transcriber.transcribe_tiktok_url(url, progress_callback)
\ No newline at end of file
+    return get_transcriber().transcribe_tiktok_url(url, progress_callback, include_full_result)
\ No newline at end of file
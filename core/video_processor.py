@@ -1,7 +1,12 @@
 import os
 import logging
+import functools
+import subprocess
+import threading
 import traceback
 import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Dict, Tuple
 
@@ -32,6 +37,173 @@ import numpy as np
 from collections import defaultdict
 import numpy as np
 import re
+from moviepy.audio.AudioClip import AudioClip
+from PIL import Image
+import imageio_ffmpeg
+import proglog
+
+from ._green_kernels import has_green_pixels, has_green_pixels_batch
+
+# Sampled frames are checked for green screen this many at a time
+GREEN_SCAN_BATCH = 8
+
+def green_pixels_needed(total_pixels: int, threshold: float) -> int:
+    """Return the smallest green pixel count whose share of total_pixels is above threshold."""
+    needed = max(int(threshold * total_pixels), 0)
+    # int() can land one off either side of the exact boundary
+    while needed / total_pixels <= threshold:
+        needed += 1
+    while needed > 0 and (needed - 1) / total_pixels > threshold:
+        needed -= 1
+    return needed
+
+# Hardware H.264 encoders to try before libx264, with the rate control to use
+# for each; -pix_fmt keeps the output playable everywhere (4:2:0)
+HW_VIDEO_ENCODERS = {
+    'h264_nvenc': ['-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-pix_fmt', 'yuv420p'],
+    'h264_qsv': ['-global_quality', '23', '-pix_fmt', 'nv12'],
+    'h264_videotoolbox': ['-q:v', '65', '-pix_fmt', 'yuv420p'],
+}
+
+@functools.cache
+def get_video_encoder() -> Tuple[str, List[str]]:
+    """Return the (codec, ffmpeg_params) to encode videos with.
+    
+    The first hardware encoder that ffmpeg lists and that can actually open
+    on this machine wins; otherwise libx264. Set VIDEO_ENCODER to force one.
+    """
+    forced = os.environ.get('VIDEO_ENCODER')
+    if forced:
+        return forced, HW_VIDEO_ENCODERS.get(forced, [])
+    
+    ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+    try:
+        listed = subprocess.run([ffmpeg, '-hide_banner', '-encoders'], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return 'libx264', []
+    
+    for codec, params in HW_VIDEO_ENCODERS.items():
+        if codec not in listed:
+            continue
+        # Builds list encoders whose hardware isn't present; try a tiny encode
+        probe = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                 '-vcodec', codec, *params, '-f', 'null', '-']
+        try:
+            if subprocess.run(probe, capture_output=True, timeout=10).returncode == 0:
+                return codec, params
+        except (OSError, subprocess.SubprocessError):
+            continue
+    return 'libx264', []
+
+# Decoded, resized images kept for reuse (about 6 MB each at 1080x1920)
+IMAGE_CACHE_SIZE = 16
+
+@functools.lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def _decode_resized(path: str, mtime_ns: int, file_size: int, size: Tuple[int, int]) -> np.ndarray:
+    with Image.open(path) as image:
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        if has_alpha:
+            # Color and alpha are resized separately, as MoviePy does for a
+            # clip and its mask, so transparent pixels keep their color
+            rgb = np.asarray(image.convert('RGB').resize(size, Image.LANCZOS))
+            alpha = np.asarray(image.getchannel('A').resize(size, Image.LANCZOS))
+            array = np.dstack([rgb, alpha])
+        else:
+            array = np.asarray(image.resize(size, Image.LANCZOS))
+    array.flags.writeable = False
+    return array
+
+def load_resized_rgb(path: str, size: Tuple[int, int]) -> np.ndarray:
+    """Decode an image resized to size (width, height) as uint8 RGB, or RGBA if it has transparency.
+    
+    Results are cached per file version, so an image used again (in another
+    group or a later render) is not decoded twice.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _decode_resized(path, stat.st_mtime_ns, stat.st_size, tuple(size))
+
+def repeat_with_gaps(samples: np.ndarray, fps: int, repeats: int, gap: float) -> AudioClip:
+    """Return an AudioClip playing samples (n x channels) repeats times, with gap seconds of silence between."""
+    length = len(samples)
+    # One period of the track, the samples followed by the gap's silence, in
+    # a single contiguous array; every repeat reads from it by plain indexing
+    pattern = np.concatenate([samples, np.zeros((int(gap * fps),) + samples.shape[1:], dtype=samples.dtype)])
+    period = len(pattern)
+    total = repeats * period - (period - length)
+    
+    def make_frame(t):
+        index = np.minimum((np.asarray(t) * fps).astype(np.int64), total - 1) % period
+        return pattern[index]
+    
+    return AudioClip(make_frame, duration=total / fps, fps=fps)
+
+def concat_segments(segment_paths: List[str], audio_path: str, output_path: str, work_dir: str) -> None:
+    """Join identically encoded video files and mux in an audio track, all by stream copy.
+
+    The output stops at whichever of the joined video and the audio ends first.
+    """
+    playlist = os.path.join(work_dir, "segments.txt")
+    with open(playlist, "w") as f:
+        for path in segment_paths:
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = [
+        imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+        '-f', 'concat', '-safe', '0', '-i', playlist,
+        '-i', audio_path,
+        '-map', '0:v', '-map', '1:a', '-c', 'copy', '-shortest',
+        output_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to join video segments: {result.stderr.decode(errors='replace')}")
+
+class CallbackProgressLogger(proglog.ProgressBarLogger):
+    """Forward MoviePy's frame-writing bar to a progress_callback(message, percent).
+
+    The bar is mapped onto start..end percent, and the callback is only
+    invoked when the integer percent changes rather than on every frame.
+    """
+
+    def __init__(self, progress_callback, message: str, start: float, end: float):
+        super().__init__()
+        self.progress_callback = progress_callback
+        self.message = message
+        self.start = start
+        self.span = end - start
+        self.last_percent = None
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        # MoviePy counts written frames on the 't' bar
+        if bar != 't' or attr != 'index':
+            return
+        total = self.bars[bar]['total']
+        if not total:
+            return
+        percent = int(self.start + (value + 1) / total * self.span)
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.progress_callback(self.message, percent)
+
+# Group prefix (e.g. "A" in A1.png) and prefix plus number (e.g. "A", "1")
+_PREFIX_RE = re.compile(r'^([A-Za-z]+)')
+_PREFIX_NUM_RE = re.compile(r'([A-Za-z]+)(\d+)')
+
+def _image_number(path: str) -> int:
+    """Sort key for an image within its group: the number after its prefix."""
+    filename = os.path.basename(path)
+    # Handle uploaded files with format: image_000_originalname.ext
+    if filename.startswith('image_') and '_' in filename:
+        parts = filename.split('_', 2)
+        if len(parts) < 3:
+            return 0
+        filename = parts[2]
+    # Extract number from name (e.g., A1.png -> 1)
+    match = _PREFIX_NUM_RE.search(filename)
+    return int(match.group(2)) if match else 0
 
 class VideoProcessor:
     """Handles video creation from images and audio"""
@@ -43,66 +215,48 @@ class VideoProcessor:
         '9:16': (1080, 1920)
     }
     
+    # Supported upload extensions, in display order, and as sets for lookups
+    IMAGE_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')
+    AUDIO_FORMATS = ('.mp3', '.wav', '.aac', '.m4a', '.ogg', '.flac')
+    _IMG_EXTS = frozenset(IMAGE_FORMATS)
+    _AUD_EXTS = frozenset(AUDIO_FORMATS)
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         
     def group_images_by_prefix(self, image_paths: List[str]) -> Dict[str, List[str]]:
         """Group images by their filename prefix (A, B, C, D, etc.)"""
         groups = defaultdict(list)
+        debug = self.logger.isEnabledFor(logging.DEBUG)
         
         for image_path in image_paths:
             filename = os.path.basename(image_path)
-            print(f"DEBUG: Processing filename: {filename}")
             
             # Handle uploaded files with format: image_000_originalname.ext
             if filename.startswith('image_') and '_' in filename:
                 # Extract the part after the second underscore
                 parts = filename.split('_', 2)
                 if len(parts) >= 3:
-                    original_name = parts[2]
                     # Extract prefix from original name
-                    match = re.match(r'^([A-Za-z]+)', original_name)
+                    match = _PREFIX_RE.match(parts[2])
                     if match:
-                        prefix = match.group(1).upper()
-                        print(f"DEBUG: Extracted prefix '{prefix}' from uploaded file: {filename}")
-                        groups[prefix].append(image_path)
+                        groups[match.group(1).upper()].append(image_path)
                         continue
             
             # Fallback: Extract prefix from beginning of filename (original logic)
-            match = re.match(r'^([A-Za-z]+)', filename)
+            match = _PREFIX_RE.match(filename)
             if match:
-                prefix = match.group(1).upper()
-                print(f"DEBUG: Extracted prefix '{prefix}' from filename: {filename}")
-                groups[prefix].append(image_path)
+                groups[match.group(1).upper()].append(image_path)
             else:
                 # If no prefix found, put in 'DEFAULT' group
-                print(f"DEBUG: No prefix found, adding to DEFAULT group: {filename}")
                 groups['DEFAULT'].append(image_path)
         
         # Sort images within each group numerically
         for prefix in groups:
-            def extract_number(path):
-                filename = os.path.basename(path)
-                # Handle uploaded files with format: image_000_originalname.ext
-                if filename.startswith('image_') and '_' in filename:
-                    parts = filename.split('_', 2)
-                    if len(parts) >= 3:
-                        original_name = parts[2]
-                        # Extract number from original name (e.g., A1.png -> 1)
-                        match = re.search(r'([A-Za-z]+)(\d+)', original_name)
-                        if match:
-                            return int(match.group(2))
-                else:
-                    # Extract number from filename (e.g., A1.png -> 1)
-                    match = re.search(r'([A-Za-z]+)(\d+)', filename)
-                    if match:
-                        return int(match.group(2))
-                return 0  # Default if no number found
+            groups[prefix].sort(key=_image_number)
+            if debug:
+                self.logger.debug(f"Sorted group '{prefix}': {[os.path.basename(p) for p in groups[prefix]]}")
             
-            groups[prefix].sort(key=extract_number)
-            print(f"DEBUG: Sorted group '{prefix}': {[os.path.basename(p) for p in groups[prefix]]}")
-            
-        print(f"DEBUG: Final groups: {dict(groups)}")
         return dict(groups)
     
     def create_green_screen_clip(self, duration: float, width: int, height: int) -> ColorClip:
@@ -147,8 +301,47 @@ class VideoProcessor:
         
         return True
     
-    def create_video_from_images(self, image_paths: List[str], audio_path: str, output_path: str, width=1920, height=1080, fps=30, progress_callback=None):
-        """Create a video from a list of images with timing based on audio length. Returns a VideoClip if output_path is None."""
+    def _batch_resize(self, image_paths: List[str], size: Tuple[int, int], progress_callback=None) -> List[np.ndarray]:
+        """Decode and resize images to size on a thread pool; failed images come back as None.
+        
+        Decoding and resizing run in Pillow/numpy without the GIL, so the
+        images are loaded in parallel; the results keep the order of image_paths.
+        """
+        total_images = len(image_paths)
+        loaded = 0
+        loaded_lock = threading.Lock()
+        
+        def load(image_path):
+            nonlocal loaded
+            try:
+                array = load_resized_rgb(image_path, size)
+            except Exception as e:
+                self.logger.warning(f"Error processing image {image_path}: {str(e)}")
+                array = None
+            
+            with loaded_lock:
+                if progress_callback:
+                    progress = 30 + (loaded / total_images) * 40
+                    progress_callback(f"Processing image {loaded+1}/{total_images}", progress)
+                loaded += 1
+            return array
+        
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as pool:
+            return list(pool.map(load, image_paths))
+    
+    def _load_image_clips(self, image_paths: List[str], seconds_per_image: float, width: int, height: int,
+                          progress_callback=None) -> List[ImageClip]:
+        """Load images as ImageClips of the given duration and size, skipping any that fail."""
+        arrays = self._batch_resize(image_paths, (width, height), progress_callback)
+        return [ImageClip(array).set_duration(seconds_per_image) for array in arrays if array is not None]
+    
+    def create_video_from_images(self, image_paths: List[str], audio_path: str, output_path: str, width=1920, height=1080, fps=30, progress_callback=None,
+                                 audio_duration: float = None):
+        """Create a video from a list of images with timing based on audio length. Returns a VideoClip if output_path is None.
+        
+        Pass audio_duration if it is already known; with output_path None the
+        audio file is then not opened and the returned clip has no audio.
+        """
         try:
             self.validate_inputs(image_paths, audio_path)
             
@@ -156,8 +349,11 @@ class VideoProcessor:
                 progress_callback("Loading audio file...", 10)
             
             # Get audio duration
-            audio_clip = AudioFileClip(audio_path)
-            audio_duration = audio_clip.duration
+            audio_clip = None
+            if audio_duration is None or output_path:
+                audio_clip = AudioFileClip(audio_path)
+                if audio_duration is None:
+                    audio_duration = audio_clip.duration
             
             # Calculate duration for each image
             total_images = len(image_paths)
@@ -171,19 +367,7 @@ class VideoProcessor:
                 progress_callback(f"Processing {total_images} images...", 30)
             
             # Create video clips from images
-            image_clips = []
-            for i, image_path in enumerate(image_paths):
-                try:
-                    clip = ImageClip(image_path).set_duration(seconds_per_image).resize((width, height))
-                    image_clips.append(clip)
-                    
-                    if progress_callback:
-                        progress = 30 + (i / total_images) * 40
-                        progress_callback(f"Processing image {i+1}/{total_images}", progress)
-                        
-                except Exception as e:
-                    self.logger.warning(f"Error processing image {image_path}: {str(e)}")
-                    continue
+            image_clips = self._load_image_clips(image_paths, seconds_per_image, width, height, progress_callback)
             
             if not image_clips:
                 raise ValueError("No valid images could be processed")
@@ -195,7 +379,8 @@ class VideoProcessor:
             final_clip = concatenate_videoclips(image_clips)
             
             # Add audio
-            final_clip = final_clip.set_audio(audio_clip)
+            if audio_clip is not None:
+                final_clip = final_clip.set_audio(audio_clip)
             
             if progress_callback:
                 progress_callback("Rendering final video...", 80)
@@ -205,13 +390,18 @@ class VideoProcessor:
                 output_dir = Path(output_path).parent
                 output_dir.mkdir(parents=True, exist_ok=True)
                 # Write final video to file
+                codec, codec_params = get_video_encoder()
+                bar_logger = 'bar'
+                if progress_callback:
+                    bar_logger = CallbackProgressLogger(progress_callback, "Rendering final video...", 80, 99)
                 final_clip.write_videofile(
                     output_path,
                     fps=fps,
-                    codec='libx264',
+                    codec=codec,
+                    ffmpeg_params=codec_params,
                     audio_codec='aac',
                     verbose=False,
-                    logger='bar'
+                    logger=bar_logger
                 )
                 if progress_callback:
                     progress_callback("Video created successfully!", 100)
@@ -238,9 +428,9 @@ class VideoProcessor:
         """Create a video from grouped images, where each group video has the full audio length."""
         try:
             fps = int(fps)
-            print(f"DEBUG: create_multi_video_with_separators called with {len(image_paths)} images")
-            print(f"DEBUG: green_screen_duration = {green_screen_duration}")
-            print(f"DEBUG: aspect_ratio = {aspect_ratio}")
+            self.logger.debug("create_multi_video_with_separators called with %d images, "
+                              "green_screen_duration=%s, aspect_ratio=%s",
+                              len(image_paths), green_screen_duration, aspect_ratio)
             
             self.validate_inputs(image_paths, audio_path)
             width, height = self.get_aspect_ratio_dimensions(aspect_ratio)
@@ -248,183 +438,97 @@ class VideoProcessor:
             # Phase 1: Processing (0% to 20%)
             if progress_callback: progress_callback("Processing: Grouping images...", 5)
             image_groups = self.group_images_by_prefix(image_paths)
-            print(f"DEBUG: Found {len(image_groups)} image groups: {list(image_groups.keys())}")
+            self.logger.debug("Found %d image groups: %s", len(image_groups), list(image_groups))
             if not image_groups:
                 raise ValueError("No image groups found.")
 
             if progress_callback: progress_callback("Processing: Loading audio...", 10)
-            audio_clip = AudioFileClip(audio_path)
-            audio_duration = audio_clip.duration
+            # The audio is decoded once, up front, and its reader closed right
+            # away; every repeat in the final track reads the same samples
+            with AudioFileClip(audio_path) as audio_clip:
+                audio_duration = audio_clip.duration
+                audio_fps = audio_clip.fps
+                samples = audio_clip.to_soundarray(fps=audio_fps).astype(np.float32)
 
-            if progress_callback: progress_callback("Processing: Creating video segments...", 15)
-            video_segments = []
             num_groups = len(image_groups)
             sorted_groups = sorted(image_groups.items())
 
-            for i, (prefix, group_images) in enumerate(sorted_groups):
-                print(f"DEBUG: Processing group {i+1}/{num_groups}: '{prefix}' with {len(group_images)} images")
-                if not group_images:
-                    self.logger.warning(f"Skipping empty image group: {prefix}")
-                    continue
+            if progress_callback: progress_callback("Processing complete.", 20)
 
-                if progress_callback:
-                    # This phase (segment creation) is from 15% to 20%
-                    progress = 15 + ((i + 1) / num_groups) * 5
-                    progress_callback(f"Processing: Creating segment for '{prefix}' ({i+1}/{num_groups})", progress)
+            # Phase 2: Writing Video (20% to 100%)
+            output_dir = Path(output_path).parent
+            output_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=output_dir) as work_dir:
+                green_file = os.path.join(work_dir, "green.mp4")
+                segment_files = {prefix: os.path.join(work_dir, f"segment_{i:03d}.mp4")
+                                 for i, (prefix, _) in enumerate(sorted_groups)}
 
-                print(f"DEBUG: About to call create_video_from_images for group '{prefix}'")
-                try:
-                    group_video = self.create_video_from_images(
-                        image_paths=group_images, audio_path=audio_path, output_path=None,
-                        width=width, height=height, fps=fps, progress_callback=None
-                    )
-                    print(f"DEBUG: create_video_from_images returned: {type(group_video)} for group '{prefix}'")
-                    if group_video and hasattr(group_video, 'duration') and group_video.duration > 0:
-                        video_segments.append(group_video)
-                        print(f"DEBUG: Successfully created segment for '{prefix}' with duration {group_video.duration}s.")
-                        self.logger.info(f"Successfully created segment for '{prefix}' with duration {group_video.duration}s.")
+                # Every group is encoded to its own file independently of the
+                # others, so the groups (and the green separator) are rendered
+                # side by side in worker processes. Each worker builds its own
+                # MoviePy clips, so no clip object is shared between renders.
+                # This runs on a request or executor thread, so the workers
+                # are spawned rather than forked: a fork would copy whatever
+                # locks other threads hold at that moment.
+                jobs = {}
+                with ProcessPoolExecutor(max_workers=min(num_groups + 1, os.cpu_count() or 1),
+                                         mp_context=multiprocessing.get_context('spawn')) as pool:
+                    for prefix, group_images in sorted_groups:
+                        # Each group's images share the full audio length
+                        seconds_per_image = audio_duration / len(group_images)
+                        future = pool.submit(_render_group_job, group_images, seconds_per_image,
+                                             segment_files[prefix], fps, width, height)
+                        jobs[future] = prefix
+                    if num_groups > 1:
+                        future = pool.submit(_render_green_job, green_screen_duration,
+                                             green_file, fps, width, height)
+                        jobs[future] = None
+
+                    image_counts = {}
+                    for done, future in enumerate(as_completed(jobs), 1):
+                        image_counts[jobs[future]] = future.result()
+                        if progress_callback:
+                            progress = 20 + (done / len(jobs)) * 75
+                            progress_callback(f"Writing video file... ({done}/{len(jobs)})", progress)
+
+                video_files = []
+                for prefix, _ in sorted_groups:
+                    if image_counts[prefix]:
+                        self.logger.info(f"Successfully created segment for '{prefix}' with {image_counts[prefix]} images.")
+                        video_files.append(segment_files[prefix])
                     else:
-                        print(f"DEBUG: Failed to create valid video segment for group '{prefix}'. group_video={group_video}")
                         self.logger.warning(f"Failed to create a valid video segment for group '{prefix}'. It will be skipped.")
-                except Exception as e:
-                    print(f"DEBUG: Exception during video segment creation for '{prefix}': {str(e)}")
-                    self.logger.error(f"Exception creating segment for '{prefix}': {str(e)}")
-                    continue
 
-            print(f"DEBUG: Created {len(video_segments)} video segments out of {num_groups} groups.")
-            self.logger.debug(f"Created {len(video_segments)} video segments out of {num_groups} groups.")
-            if not video_segments:
-                raise ValueError("No valid video segments could be created. Please check image files and logs.")
+                self.logger.debug("Created %d video segments out of %d groups.", len(video_files), num_groups)
+                if not video_files:
+                    raise ValueError("No valid video segments could be created. Please check image files and logs.")
 
-            if progress_callback: progress_callback("Processing complete.", 20)
+                # Green separators go between the segments
+                segment_list = []
+                for i, video_file in enumerate(video_files):
+                    if i:
+                        segment_list.append(green_file)
+                    segment_list.append(video_file)
 
-            print(f"DEBUG: Starting Phase 2 - Video concatenation and writing")
-            # Phase 2: Writing Video (20% to 100%)
-            final_clips = []
-            print(f"DEBUG: Building final clips list with {len(video_segments)} segments")
-            for i, segment in enumerate(video_segments):
-                print(f"DEBUG: Adding segment {i+1}/{len(video_segments)} to final clips")
-                final_clips.append(segment)
-                if i < len(video_segments) - 1:
-                    print(f"DEBUG: Creating green screen separator {i+1}")
-                    green_clip = self.create_green_screen_clip(green_screen_duration, width, height)
-                    final_clips.append(green_clip)
-            print(f"DEBUG: Final clips list has {len(final_clips)} clips total")
-            # Ensure all clips have a numeric duration
-            for i, clip in enumerate(final_clips):
-                duration = getattr(clip, 'duration', 0)
-                logging.debug(f"Clip {i}: type={type(clip)}, original duration={repr(duration)}, type={type(duration)}")
-                if duration is None:
-                    duration = 0
-                
-                try:
-                    numeric_duration = float(duration)
-                except (ValueError, TypeError):
-                    logging.error(f"Could not convert duration '{duration}' to float for clip {i}. Defaulting to 0.")
-                    numeric_duration = 0.0
-                
-                clip.duration = numeric_duration
-
-            if not final_clips:
-                raise ValueError("No video clips to process.")
-
-            print(f"DEBUG: About to concatenate {len(final_clips)} clips")
-            final_video = concatenate_videoclips(final_clips, method="compose")
-            print(f"DEBUG: Video concatenation completed successfully")
-
-            # Create audio track: repeat audio for each group + silence for green screens
-            print(f"DEBUG: Creating audio track for {num_groups} groups")
-            audio_segments = []
-            for i in range(num_groups):
-                audio_segments.append(audio_clip)
-                if i < num_groups - 1:  # Add silence for green screen (except after last group)
-                    silence = audio_clip.subclip(0, green_screen_duration).volumex(0)  # Silent audio
-                    audio_segments.append(silence)
-            
-            print(f"DEBUG: Concatenating {len(audio_segments)} audio segments")
-            final_audio = concatenate_audioclips(audio_segments)
-            print(f"DEBUG: Setting audio to final video")
-            
-            final_video = final_video.set_audio(final_audio)
-            if final_video.duration > final_video.audio.duration:
-                final_video.duration = final_video.audio.duration
-            print(f"DEBUG: Final video prepared, duration: {final_video.duration}s")
-
-            # Calculate progress weights for writing phase
-            writing_progress_total = 80  # 80% of total progress
-            progress_per_segment = writing_progress_total / num_groups if num_groups > 0 else 0
-
-            def custom_logger(bar_name, current_frame, total_frames):
-                if total_frames > 0:
-                    # This is the progress for the current segment being written
-                    segment_progress = (current_frame / total_frames) * 100
-                    # Find which segment we are on by looking at the bar name (e.g., 't:   1/4')
-                    try:
-                        segment_num_str = re.search(r'(\d+)/\d+', bar_name).group(1)
-                        segment_num = int(segment_num_str) - 1
-                    except (AttributeError, ValueError):
-                        segment_num = 0 # Default to first segment if parsing fails
-
-                    # Calculate overall progress
-                    # Progress of completed segments + progress of current segment
-                    base_progress = 20 + (segment_num * progress_per_segment)
-                    current_segment_contribution = (segment_progress / 100) * progress_per_segment
-                    total_progress = base_progress + current_segment_contribution
+                # Create audio track: repeat audio for each group + silence for green screens.
+                if progress_callback: progress_callback("Writing audio track...", 95)
+                final_audio = repeat_with_gaps(samples, audio_fps, len(video_files), green_screen_duration)
+                audio_file = os.path.join(work_dir, "audio.m4a")
+                final_audio.write_audiofile(audio_file, fps=44100, codec='aac', verbose=False, logger=None)
+
+                # ffmpeg's concat demuxer joins the files and muxes in the
+                # audio without re-encoding anything
+                self.logger.debug("Joining %d segment files into: %s", len(segment_list), output_path)
+                concat_segments(segment_list, audio_file, output_path, work_dir)
 
-                    if progress_callback:
-                        progress_callback(f"Writing video file... ({segment_num+1}/{num_groups})", total_progress)
-
-            class ProgressLogger:
-                def __init__(self, callback):
-                    self.callback = callback
-                def __call__(self, *args, **kwargs):
-                    # MoviePy's logger can be called with messages or progress data.
-                    # We only care about the progress data, which comes as positional args.
-                    if len(args) == 3: # bar_name, current_frame, total_frames
-                        self.callback(args[0], args[1], args[2])
-
-                def iter_bar(self, **kwargs):
-                    # This is needed for audio processing. Just pass through the iterator.
-                    iterable = kwargs.get('iterable', [])
-                    for i in iterable:
-                        yield i
-
-                def bars_end(self):
-                    pass # No action needed at the end of all bars
-
-            print(f"DEBUG: About to write final video to: {output_path}")
-            final_video.write_videofile(
-                output_path,
-                fps=fps,
-                codec='libx264',
-                audio_codec='aac',
-                verbose=True,
-                logger=None,
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True
-            )
-            print(f"DEBUG: Video file writing completed successfully")
-            
             # Check file size immediately after writing
-            import os
             if os.path.exists(output_path):
                 file_size = os.path.getsize(output_path)
-                print(f"DEBUG: Output file size: {file_size} bytes")
+                self.logger.debug("Output file size: %d bytes", file_size)
                 if file_size < 1000:
-                    print(f"DEBUG: WARNING - File size is suspiciously small: {file_size} bytes")
+                    self.logger.warning("Output file size is suspiciously small: %d bytes", file_size)
             else:
-                print(f"DEBUG: ERROR - Output file does not exist: {output_path}")
-
-            # Clean up temporary files
-            if isinstance(audio_clip, AudioFileClip):
-                audio_clip.close()
-            if isinstance(final_audio, AudioFileClip):
-                final_audio.close()
-            final_video.close()
-            for seg in video_segments:
-                seg.close()
-            for cl in final_clips:
-                cl.close()
+                self.logger.error("Output file does not exist: %s", output_path)
             
         except Exception as e:
             self.logger.error(f"Error creating multi-video: {str(e)}")
@@ -432,13 +536,56 @@ class VideoProcessor:
                 progress_callback(f"Error: {str(e)}", 0)
             raise
     
+    def _render_group_segment(self, image_paths: List[str], seconds_per_image: float, path: str,
+                              fps: int, width: int, height: int) -> int:
+        """Encode a group's images as a silent slideshow at path; return how many images it uses."""
+        clips = self._load_image_clips(image_paths, seconds_per_image, width, height)
+        try:
+            if clips:
+                self._write_segment(clips, path, fps, width, height)
+            return len(clips)
+        finally:
+            for clip in clips:
+                clip.close()
+
+    def _render_green_segment(self, duration: float, path: str, fps: int, width: int, height: int) -> None:
+        """Encode the green screen separator at path."""
+        with self.create_green_screen_clip(duration, width, height) as green_clip:
+            self._write_segment([green_clip], path, fps, width, height)
+
+    def _write_segment(self, clips: List, path: str, fps: int, width: int, height: int) -> None:
+        """Encode clips, played back to back, as a silent video file."""
+        # All clips are built at width x height, so they can simply be
+        # played one after another; only transparent images (or a clip of
+        # another size) need compositing onto the black background
+        uniform = all(clip.mask is None and tuple(clip.size) == (width, height) for clip in clips)
+        codec, codec_params = get_video_encoder()
+        with concatenate_videoclips(clips, method="chain" if uniform else "compose") as video:
+            video.write_videofile(
+                path,
+                fps=fps,
+                codec=codec,
+                ffmpeg_params=codec_params,
+                audio=False,
+                verbose=False,
+                logger=None
+            )
+
     def get_supported_image_formats(self) -> List[str]:
         """Get list of supported image formats"""
-        return ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
+        return list(self.IMAGE_FORMATS)
     
     def get_supported_audio_formats(self) -> List[str]:
         """Get list of supported audio formats"""
-        return ['.mp3', '.wav', '.aac', '.m4a', '.ogg', '.flac']
+        return list(self.AUDIO_FORMATS)
+    
+    def _is_valid_image(self, filename: str) -> bool:
+        """Check whether filename has a supported image extension"""
+        return os.path.splitext(filename)[1].lower() in self._IMG_EXTS
+    
+    def _is_valid_audio(self, filename: str) -> bool:
+        """Check whether filename has a supported audio extension"""
+        return os.path.splitext(filename)[1].lower() in self._AUD_EXTS
     
     def detect_green_screen_segments(self, video_path: str, green_threshold: float = 0.8, progress_callback=None) -> List[Tuple[float, float]]:
         """Detect green screen segments in a video and return their time ranges"""
@@ -446,25 +593,29 @@ class VideoProcessor:
             if progress_callback:
                 progress_callback("Loading video...", 10)
             
-            video = VideoFileClip(video_path)
-            fps = video.fps
-            duration = video.duration
+            # Sample frames at regular intervals (every 2 seconds for faster processing)
+            sample_interval = 2.0
+            duration, batches = self._sample_frame_batches(video_path, sample_interval, GREEN_SCAN_BATCH)
             
             green_segments = []
             current_green_start = None
             
-            # Sample frames at regular intervals (every 2 seconds for faster processing)
-            sample_interval = 2.0
-            total_samples = int(duration / sample_interval)
+            total_samples = max(int(duration / sample_interval), 1)
+            i = 0
             
-            for i, t in enumerate(np.arange(0, duration, sample_interval)):
-                if progress_callback:
-                    progress = 10 + (i / total_samples) * 70
-                    progress_callback(f"Analyzing frame at {t:.1f}s...", progress)
-                
+            for times, batch in batches:
                 try:
-                    frame = video.get_frame(t)
-                    is_green = self._is_green_screen_frame(frame, green_threshold)
+                    flags = self._are_green_screen_frames(batch, green_threshold)
+                except Exception as e:
+                    self.logger.warning(f"Error processing frames at {times[0]}-{times[-1]}s: {str(e)}")
+                    i += len(times)
+                    continue
+                
+                for t, is_green in zip(times, flags):
+                    if progress_callback:
+                        progress = 10 + (i / total_samples) * 70
+                        progress_callback(f"Analyzing frame at {t:.1f}s...", progress)
+                    i += 1
                     
                     if is_green and current_green_start is None:
                         # Start of green screen segment
@@ -473,17 +624,11 @@ class VideoProcessor:
                         # End of green screen segment
                         green_segments.append((current_green_start, t))
                         current_green_start = None
-                        
-                except Exception as e:
-                    self.logger.warning(f"Error processing frame at {t}s: {str(e)}")
-                    continue
             
             # Handle case where video ends with green screen
             if current_green_start is not None:
                 green_segments.append((current_green_start, duration))
             
-            video.close()
-            
             if progress_callback:
                 progress_callback(f"Found {len(green_segments)} green screen segments", 80)
             
@@ -493,40 +638,66 @@ class VideoProcessor:
             self.logger.error(f"Error detecting green screen segments: {str(e)}")
             raise
     
+    def _sample_frame_batches(self, video_path: str, interval: float, batch_size: int):
+        """Return the video's duration and an iterator of (times, N x H x W x 3 frames) sampled every interval seconds.
+        
+        ffmpeg decodes the video in one forward pass and its select filter
+        drops the frames in between, so only the sampled frames are piped back.
+        Samples are taken every step-th frame by index, and their times are
+        computed from that index. They are read into one reused batch buffer,
+        so each batch is only valid until the next one is requested.
+        """
+        # Only the header is needed to find the frame rate
+        probe = imageio_ffmpeg.read_frames(video_path)
+        fps = next(probe)["fps"]
+        probe.close()
+        step = max(1, int(round(fps * interval)))
+        
+        reader = imageio_ffmpeg.read_frames(
+            video_path,
+            output_params=["-vf", f"select=not(mod(n\\,{step}))", "-vsync", "passthrough"]
+        )
+        meta = next(reader)
+        width, height = meta["size"]
+        
+        def batches():
+            buffer = np.empty((batch_size, height, width, 3), dtype=np.uint8)
+            times = []
+            try:
+                for i, raw in enumerate(reader):
+                    t = i * step / fps
+                    if t >= meta["duration"]:
+                        break
+                    buffer[len(times)] = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 3)
+                    times.append(t)
+                    if len(times) == batch_size:
+                        yield times, buffer
+                        times = []
+                if times:
+                    yield times, buffer[:len(times)]
+            finally:
+                reader.close()
+        
+        return meta["duration"], batches()
+    
+    def _are_green_screen_frames(self, frames: np.ndarray, threshold: float = 0.8) -> np.ndarray:
+        """Check each frame of an N x H x W x 3 uint8 batch for being predominantly green screen"""
+        needed = green_pixels_needed(frames.shape[1] * frames.shape[2], threshold)
+        return has_green_pixels_batch(frames, needed)
+    
     def _is_green_screen_frame(self, frame: np.ndarray, threshold: float = 0.8) -> bool:
         """Check if a frame is predominantly green screen"""
-        # Normalize frame to 0-1
-        frame = frame.astype(np.float32) / 255.0
-        # Extract channels (assuming frame is RGB)
-        r = frame[:,:,0]
-        g = frame[:,:,1]
-        b = frame[:,:,2]
-        # Compute max and min
-        cmax = np.maximum(np.maximum(r, g), b)
-        cmin = np.minimum(np.minimum(r, g), b)
-        delta = cmax - cmin
-        # Hue
-        h = np.zeros_like(cmax)
-        mask = delta > 0
-        idx = (cmax == r) & mask
-        h[idx] = np.mod(60 * (g[idx] - b[idx]) / delta[idx] + 360, 360)
-        idx = (cmax == g) & mask
-        h[idx] = np.mod(60 * (b[idx] - r[idx]) / delta[idx] + 120, 360)
-        idx = (cmax == b) & mask
-        h[idx] = np.mod(60 * (r[idx] - g[idx]) / delta[idx] + 240, 360)
-        h = h / 360.0  # to 0-1
-        # Saturation
-        s = np.where(cmax > 0, delta / cmax, 0)
-        # Value
-        v = cmax
-        # Green range in 0-1 scale
-        lower_green = (0.222, 0.196, 0.196)
-        upper_green = (0.444, 1.0, 1.0)
-        # Mask
-        mask = (h >= lower_green[0]) & (h <= upper_green[0]) & \
-               (s >= lower_green[1]) & (s <= upper_green[1]) & \
-               (v >= lower_green[2]) & (v <= upper_green[2])
-        green_pixels = np.sum(mask)
-        total_pixels = frame.shape[0] * frame.shape[1]
-        green_percentage = green_pixels / total_pixels
-        return green_percentage > threshold
\ No newline at end of file
+        frame = np.ascontiguousarray(frame[:, :, :3], dtype=np.uint8)
+        needed = green_pixels_needed(frame.shape[0] * frame.shape[1], threshold)
+        return bool(has_green_pixels(frame, needed))
+
+
+# Worker-process entry points for create_multi_video_with_separators. They
+# take plain arguments and build their own processor, so submitting a job
+# pickles only paths and numbers.
+def _render_group_job(image_paths: List[str], seconds_per_image: float, path: str,
+                      fps: int, width: int, height: int) -> int:
+    return VideoProcessor()._render_group_segment(image_paths, seconds_per_image, path, fps, width, height)
+
+def _render_green_job(duration: float, path: str, fps: int, width: int, height: int) -> None:
+    VideoProcessor()._render_green_segment(duration, path, fps, width, height)
@@ -8,13 +8,45 @@ import os
 import sys
 import subprocess
 import json
+import asyncio
+import shlex
+import shutil
+import tempfile
+import time
 from pathlib import Path
 
+# Version commands used to check that each deployment CLI is installed
+CLI_PROBES = {
+    'railway': 'railway --version',
+    'heroku': 'heroku --version',
+    'docker': 'docker --version',
+    'vercel': 'vercel --version',
+    'netlify': 'netlify --version',
+    'ngrok': 'ngrok version',
+}
+
+# Probe results for installed CLIs are reused from this file for an hour;
+# run with --refresh to probe again
+_CLI_CACHE = Path(tempfile.gettempdir()) / "darkvid_cli_cache.json"
+CLI_CACHE_TTL = 3600
+
+# {name: {"ok": bool, "version": str, "ts": epoch}}, filled in by load_cli_status()
+_cli_status = {}
+
 def run_command(cmd, check=True):
-    """Run a shell command and return the result."""
-    print(f"Running: {cmd}")
+    """Run a command (without a shell) and return the result.
+    
+    cmd is either an argv list or a string, which is split like a shell would.
+    """
+    argv = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+    print(f"Running: {shlex.join(argv)}")
+    # Without a shell, npm's .cmd shims (railway, vercel, npx...) are only
+    # found on Windows by resolving the executable ourselves, as probe() does
+    executable = shutil.which(argv[0]) if argv else None
+    if executable:
+        argv[0] = executable
     try:
-        result = subprocess.run(cmd, shell=True, check=check, capture_output=True, text=True)
+        result = subprocess.run(argv, check=check, capture_output=True, text=True)
         if result.stdout:
             print(result.stdout)
         return result
@@ -23,6 +55,60 @@ def run_command(cmd, check=True):
         if e.stderr:
             print(f"Error output: {e.stderr}")
         return None
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return None
+
+async def probe(cmd):
+    """Run cmd and return (succeeded, first line of its output)."""
+    argv = shlex.split(cmd)
+    # Resolve the executable first (this also finds npm's .cmd shims on Windows)
+    executable = shutil.which(argv[0])
+    if executable is None:
+        return False, ""
+    proc = await asyncio.create_subprocess_exec(
+        executable, *argv[1:], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    stdout, _ = await proc.communicate()
+    lines = stdout.decode(errors="replace").strip().splitlines()
+    return proc.returncode == 0, lines[0] if lines else ""
+
+async def probe_all(names):
+    """Check the named deployment CLIs at once and return {name: (installed, version)}."""
+    results = await asyncio.gather(*(probe(CLI_PROBES[name]) for name in names), return_exceptions=True)
+    return {name: result if isinstance(result, tuple) else (False, "") for name, result in zip(names, results)}
+
+def load_cli_status(refresh=False):
+    """Fill in which deployment CLIs are installed, probing only what the cache can't answer.
+    
+    Missing CLIs are always probed again: shutil.which() turns them down
+    without starting a process, and a tool installed a minute ago shows up.
+    """
+    cached = {}
+    if not refresh:
+        try:
+            cached = json.loads(_CLI_CACHE.read_text())
+        except (OSError, ValueError):
+            cached = {}
+    
+    now = time.time()
+    stale = [name for name in CLI_PROBES
+             if not cached.get(name, {}).get("ok") or now - cached[name].get("ts", 0) >= CLI_CACHE_TTL]
+    if stale:
+        for name, (ok, version) in asyncio.run(probe_all(stale)).items():
+            cached[name] = {"ok": ok, "version": version, "ts": now}
+        try:
+            _CLI_CACHE.write_text(json.dumps(cached))
+        except OSError:
+            pass
+    
+    _cli_status.update(cached)
+
+def check_cli(name):
+    """Return whether the named deployment CLI is installed."""
+    if name not in _cli_status:
+        load_cli_status()
+    return _cli_status[name]["ok"]
 
 def check_requirements():
     """Check if required files exist."""
@@ -41,8 +127,7 @@ def deploy_railway():
     print("\n🚂 Deploying to Railway...")
     
     # Check if Railway CLI is installed
-    result = run_command("railway --version", check=False)
-    if not result or result.returncode != 0:
+    if not check_cli('railway'):
         print("❌ Railway CLI not found. Install it with:")
         print("   npm install -g @railway/cli")
         return False
@@ -69,8 +154,7 @@ def deploy_heroku():
     print("\n🟣 Deploying to Heroku...")
     
     # Check if Heroku CLI is installed
-    result = run_command("heroku --version", check=False)
-    if not result or result.returncode != 0:
+    if not check_cli('heroku'):
         print("❌ Heroku CLI not found. Install it from: https://devcenter.heroku.com/articles/heroku-cli")
         return False
     
@@ -86,7 +170,7 @@ def deploy_heroku():
     
     # Create Heroku app
     if app_name:
-        result = run_command(f"heroku create {app_name}")
+        result = run_command(["heroku", "create", app_name])
     else:
         result = run_command("heroku create")
     
@@ -108,8 +192,7 @@ def deploy_docker():
     print("\n🐳 Building Docker image...")
     
     # Check if Docker is installed
-    result = run_command("docker --version", check=False)
-    if not result or result.returncode != 0:
+    if not check_cli('docker'):
         print("❌ Docker not found. Install it from: https://docker.com")
         return False
     
@@ -130,8 +213,7 @@ def setup_ngrok():
     print("\n🌐 Setting up ngrok for quick testing...")
     
     # Check if ngrok is installed
-    result = run_command("ngrok version", check=False)
-    if not result or result.returncode != 0:
+    if not check_cli('ngrok'):
         print("❌ ngrok not found. Install it from: https://ngrok.com")
         print("   macOS: brew install ngrok")
         return False
@@ -149,8 +231,7 @@ def deploy_vercel():
     print("\n▲ Deploying to Vercel...")
     
     # Check if Vercel CLI is installed
-    result = run_command("vercel --version", check=False)
-    if not result or result.returncode != 0:
+    if not check_cli('vercel'):
         print("❌ Vercel CLI not found.")
         print("\n📦 Installation options:")
         print("   1. npm install -g vercel")
@@ -188,8 +269,7 @@ def deploy_netlify():
     print("⚠️  Note: Netlify is better for static sites. Consider Railway or Vercel for this Flask app.")
     
     # Check if Netlify CLI is installed
-    result = run_command("netlify --version", check=False)
-    if not result or result.returncode != 0:
+    if not check_cli('netlify'):
         print("❌ Netlify CLI not found.")
         print("\n📦 Installation options:")
         print("   1. npm install -g netlify-cli")
@@ -274,6 +354,9 @@ def main():
     if not check_requirements():
         sys.exit(1)
     
+    # Probe the deployment CLIs concurrently, once, before showing the menu
+    load_cli_status(refresh='--refresh' in sys.argv[1:])
+    
     while True:
         show_menu()
         choice = input("\nSelect an option (1-8): ").strip()
@@ -7,18 +7,80 @@ Runs all unit tests and integration tests.
 import unittest
 import sys
 import os
+import time
+import json
+import hashlib
 from pathlib import Path
 
 # Add the project root to the path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
+# Test ids from the last unittest discovery, reused while no test file changes
+DISCOVERY_CACHE = project_root / '.pytest_cache' / 'discovery.json'
+DISCOVERY_CACHE_TTL = 7 * 24 * 3600
+
+def pytest_args():
+    """Extra pytest arguments that shard the run over worker processes, if pytest-xdist is installed."""
+    try:
+        import xdist  # noqa: F401
+    except ImportError:
+        return []
+    # --dist=loadfile keeps each file's tests (and their setUp state) on one worker
+    return ['-n', str(max(1, (os.cpu_count() or 1) - 2)), '--dist=loadfile']
+
+def _iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iter_tests(test)
+        else:
+            yield test
+
+def discover_tests(loader, start_dir):
+    """Discover the tests under start_dir, reusing the cached test ids when no test file has changed."""
+    digest = hashlib.sha1()
+    for path in sorted(start_dir.glob('test_*.py')):
+        digest.update(f"{path.name}:{path.stat().st_mtime_ns}".encode())
+    key = digest.hexdigest()
+    
+    try:
+        with open(DISCOVERY_CACHE) as f:
+            cached = json.load(f)
+        if cached['key'] == key and time.time() - cached['ts'] < DISCOVERY_CACHE_TTL:
+            # discover() puts start_dir on sys.path; the cached ids rely on that too
+            if str(start_dir) not in sys.path:
+                sys.path.insert(0, str(start_dir))
+            return loader.loadTestsFromNames(cached['ids'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    suite = loader.discover(start_dir, pattern='test_*.py')
+    ids = [test.id() for test in _iter_tests(suite)]
+    # Modules that failed to import show up as unittest.loader._FailedTest; rediscover those next time
+    if not any(test_id.startswith('unittest.') for test_id in ids):
+        try:
+            DISCOVERY_CACHE.parent.mkdir(exist_ok=True)
+            with open(DISCOVERY_CACHE, 'w') as f:
+                json.dump({'key': key, 'ts': time.time(), 'ids': ids}, f)
+        except OSError:
+            pass
+    return suite
+
 def run_tests():
     """Run all tests in the tests directory."""
+    start_dir = project_root / 'tests'
+    try:
+        import pytest
+    except ImportError:
+        pytest = None
+    
+    if pytest is not None:
+        exit_code = pytest.main(pytest_args() + ['-v', str(start_dir)])
+        return 0 if exit_code == pytest.ExitCode.OK else 1
+    
     # Discover and run tests
     loader = unittest.TestLoader()
-    start_dir = project_root / 'tests'
-    suite = loader.discover(start_dir, pattern='test_*.py')
+    suite = discover_tests(loader, start_dir)
     
     # Run tests with verbose output
     runner = unittest.TextTestRunner(verbosity=2)
@@ -29,6 +91,15 @@ def run_tests():
 
 def run_specific_test(test_module):
     """Run a specific test module."""
+    try:
+        import pytest
+    except ImportError:
+        pytest = None
+    
+    if pytest is not None:
+        exit_code = pytest.main(['-v', str(project_root / 'tests' / f'{test_module}.py')])
+        return 0 if exit_code == pytest.ExitCode.OK else 1
+    
     loader = unittest.TestLoader()
     suite = loader.loadTestsFromName(f'tests.{test_module}')
     
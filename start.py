@@ -7,31 +7,40 @@ Provides easy access to different modes of operation
 import os
 import sys
 import subprocess
-import webbrowser
-import time
-import threading
+import queue
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Result of the last dependency check, so returning to the menu does not re-probe
+_DEPS_OK = None
+
 def check_dependencies():
     """Check if required dependencies are installed."""
-    try:
-        import flask
-        import moviepy
-        import numpy
-        import PIL
+    global _DEPS_OK
+    if _DEPS_OK is not None:
+        return _DEPS_OK
+    
+    # find_spec only locates the packages; importing moviepy just to check it is there is slow
+    missing = [name for name in ("flask", "moviepy", "numpy", "PIL")
+               if importlib.util.find_spec(name) is None]
+    if not missing:
         print("✅ All dependencies found")
+        _DEPS_OK = True
         return True
-    except ImportError as e:
-        print(f"❌ Missing dependency: {e}")
-        print("\n📦 Installing dependencies...")
-        try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
-            print("✅ Dependencies installed successfully")
-            return True
-        except subprocess.CalledProcessError:
-            print("❌ Failed to install dependencies")
-            print("Please run: pip install -r requirements.txt")
-            return False
+    
+    print(f"❌ Missing dependency: {', '.join(missing)}")
+    print("\n📦 Installing dependencies...")
+    try:
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+        print("✅ Dependencies installed successfully")
+        _DEPS_OK = True
+    except subprocess.CalledProcessError:
+        print("❌ Failed to install dependencies")
+        print("Please run: pip install -r requirements.txt")
+        _DEPS_OK = False
+    return _DEPS_OK
 
 def start_web_gui():
     """Start the web GUI."""
@@ -72,10 +81,8 @@ def test_with_gunicorn():
     print("Access at: http://localhost:8000")
     print("Press Ctrl+C to stop.\n")
     
-    try:
-        # Check if gunicorn is installed
-        subprocess.check_call([sys.executable, "-c", "import gunicorn"])
-    except (subprocess.CalledProcessError, ImportError):
+    # Check if gunicorn is installed
+    if importlib.util.find_spec("gunicorn") is None:
         print("Installing gunicorn...")
         subprocess.check_call([sys.executable, "-m", "pip", "install", "gunicorn"])
     
@@ -113,21 +120,19 @@ def show_system_info():
     
     # Check for required files
     required_files = ['gui_web.py', 'requirements.txt', 'core/', 'templates/']
+    with os.scandir('.') as entries:
+        names = {entry.name for entry in entries}
     print("\n📁 Required files:")
     for file in required_files:
-        path = Path(file)
-        status = "✅" if path.exists() else "❌"
+        status = "✅" if file.rstrip('/') in names else "❌"
         print(f"   {status} {file}")
     
     # Check Python packages
     print("\n📦 Key dependencies:")
     packages = ['flask', 'moviepy', 'numpy', 'PIL', 'cv2']
     for package in packages:
-        try:
-            __import__(package)
-            print(f"   ✅ {package}")
-        except ImportError:
-            print(f"   ❌ {package}")
+        status = "✅" if importlib.util.find_spec(package) is not None else "❌"
+        print(f"   {status} {package}")
 
 def run_code_quality_checks():
     """Run code quality and security checks."""
@@ -140,31 +145,67 @@ def run_code_quality_checks():
         ("mypy .", "Type checking (mypy)")
     ]
     
-    for command, description in checks:
-        print(f"\n📋 {description}...")
+    # The tools are independent, so run them side by side. Each one streams its
+    # output into a shared queue; this thread prints one tool at a time, in
+    # order, holding back lines from later tools until the earlier ones finish.
+    events = queue.Queue()
+    
+    def run_check(index, command):
         try:
-            result = subprocess.run(command.split(), capture_output=True, text=True)
-            if result.returncode == 0:
-                print(f"✅ {description} passed")
-            else:
-                print(f"⚠️  {description} found issues:")
-                print(result.stdout)
-                if result.stderr:
-                    print(result.stderr)
-        except FileNotFoundError:
-            print(f"❌ Tool not installed. Install with: pip install {command.split()[0]}")
+            proc = subprocess.Popen(command.split(), stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, text=True, bufsize=1)
         except Exception as e:
-            print(f"❌ Error running {description}: {e}")
+            events.put((index, 'error', e))
+            return
+        with proc:
+            for line in proc.stdout:
+                events.put((index, 'line', line))
+        events.put((index, 'done', proc.returncode))
+    
+    def report(index, kind, value):
+        command, description = checks[index]
+        if kind == 'error' and isinstance(value, FileNotFoundError):
+            print(f"❌ Tool not installed. Install with: pip install {command.split()[0]}")
+        elif kind == 'error':
+            print(f"❌ Error running {description}: {value}")
+        elif value == 0:
+            print(f"✅ {description} passed")
+        else:
+            print(f"⚠️  {description} found issues (exit code {value})")
+    
+    pending = [deque() for _ in checks]
+    current = 0
+    with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+        for index, (command, _) in enumerate(checks):
+            pool.submit(run_check, index, command)
+        
+        print(f"\n📋 {checks[0][1]}...")
+        while current < len(checks):
+            index, kind, value = events.get()
+            pending[index].append((kind, value))
+            while current < len(checks) and pending[current]:
+                kind, value = pending[current].popleft()
+                if kind == 'line':
+                    print(value, end='')
+                    continue
+                report(current, kind, value)
+                current += 1
+                if current < len(checks):
+                    print(f"\n📋 {checks[current][1]}...")
+
+_DOCS_MENU = (
+    "\n📚 Available Documentation:\n"
+    + "=" * 40 + "\n"
+    "1. 📖 README.md - Main documentation\n"
+    "2. 🚀 DEPLOYMENT.md - Deployment guide\n"
+    "3. 🔧 TROUBLESHOOTING.md - Common issues\n"
+    "4. 💎 CODE_QUALITY.md - Code quality guide\n"
+    "0. ⬅️  Back to main menu\n"
+)
 
 def view_documentation():
     """View available documentation files."""
-    print("\n📚 Available Documentation:")
-    print("=" * 40)
-    print("1. 📖 README.md - Main documentation")
-    print("2. 🚀 DEPLOYMENT.md - Deployment guide")
-    print("3. 🔧 TROUBLESHOOTING.md - Common issues")
-    print("4. 💎 CODE_QUALITY.md - Code quality guide")
-    print("0. ⬅️  Back to main menu")
+    sys.stdout.write(_DOCS_MENU)
     
     while True:
         choice = input("\nSelect documentation to view (0-4): ").strip()
@@ -198,19 +239,24 @@ def open_file_in_editor(filename):
     except Exception as e:
         print(f"❌ Error opening {filename}: {e}")
 
+# Built once and written in a single call each time the menu is shown
+_MENU = (
+    "\n🎬 ImageToVideo Creator - Quick Start\n"
+    + "=" * 40 + "\n"
+    "1. 🌐 Start Web GUI (Development)\n"
+    "2. 🚀 Start Production Mode (Testing)\n"
+    "3. 🔧 Test with Gunicorn\n"
+    "4. 📤 Deployment Helper\n"
+    "5. 🔍 Run Code Quality Checks\n"
+    "6. 💻 System Information\n"
+    "7. 📚 View Documentation\n"
+    "8. 🚪 Exit\n"
+    + "=" * 40 + "\n"
+)
+
 def show_menu():
     """Show the main menu."""
-    print("\n🎬 ImageToVideo Creator - Quick Start")
-    print("=" * 40)
-    print("1. 🌐 Start Web GUI (Development)")
-    print("2. 🚀 Start Production Mode (Testing)")
-    print("3. 🔧 Test with Gunicorn")
-    print("4. 📤 Deployment Helper")
-    print("5. 🔍 Run Code Quality Checks")
-    print("6. 💻 System Information")
-    print("7. 📚 View Documentation")
-    print("8. 🚪 Exit")
-    print("=" * 40)
+    sys.stdout.write(_MENU)
 
 def open_documentation():
     """Open documentation files."""
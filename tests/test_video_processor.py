@@ -6,6 +6,7 @@ Unit tests for the video processor module.
 import unittest
 import tempfile
 import os
+import shutil
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 
@@ -19,47 +20,66 @@ from core.video_processor import VideoProcessor
 class TestVideoProcessor(unittest.TestCase):
     """Test cases for VideoProcessor class."""
     
+    @classmethod
+    def setUpClass(cls):
+        """Set up the processor shared by every test; none of them mutate it."""
+        cls.processor = VideoProcessor()
+    
     def setUp(self):
         """Set up test fixtures."""
-        self.processor = VideoProcessor()
         self.temp_dir = tempfile.mkdtemp()
         
     def tearDown(self):
         """Clean up test fixtures."""
         # Clean up temporary files
-        import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
     
     def test_init(self):
         """Test VideoProcessor initialization."""
-        self.assertIsInstance(self.processor, VideoProcessor)
-        self.assertEqual(self.processor.fps, 30)
-        self.assertEqual(self.processor.aspect_ratio, (9, 16))
+        processor = VideoProcessor()
+        self.assertIsInstance(processor, VideoProcessor)
+        self.assertEqual(processor.fps, 30)
+        self.assertEqual(processor.aspect_ratio, (9, 16))
     
     def test_validate_image_files(self):
         """Test image file validation."""
-        # Test with valid extensions
-        valid_files = ['test.jpg', 'test.png', 'test.jpeg', 'test.bmp']
-        for file in valid_files:
-            self.assertTrue(self.processor._is_valid_image(file))
-        
-        # Test with invalid extensions
-        invalid_files = ['test.txt', 'test.mp4', 'test.doc']
-        for file in invalid_files:
-            self.assertFalse(self.processor._is_valid_image(file))
+        self.assertIsInstance(VideoProcessor._IMG_EXTS, frozenset)
+        cases = [
+            ('test.jpg', True), ('test.png', True), ('test.jpeg', True), ('test.bmp', True),
+            ('TEST.JPG', True),
+            ('test.txt', False), ('test.mp4', False), ('test.doc', False),
+        ]
+        for file, expected in cases:
+            with self.subTest(file=file):
+                self.assertEqual(self.processor._is_valid_image(file), expected)
     
     def test_validate_audio_files(self):
         """Test audio file validation."""
-        # Test with valid extensions
-        valid_files = ['test.mp3', 'test.wav', 'test.aac', 'test.m4a']
-        for file in valid_files:
-            self.assertTrue(self.processor._is_valid_audio(file))
-        
-        # Test with invalid extensions
-        invalid_files = ['test.txt', 'test.mp4', 'test.doc']
-        for file in invalid_files:
-            self.assertFalse(self.processor._is_valid_audio(file))
+        self.assertIsInstance(VideoProcessor._AUD_EXTS, frozenset)
+        cases = [
+            ('test.mp3', True), ('test.wav', True), ('test.aac', True), ('test.m4a', True),
+            ('TEST.MP3', True),
+            ('test.txt', False), ('test.mp4', False), ('test.doc', False),
+        ]
+        for file, expected in cases:
+            with self.subTest(file=file):
+                self.assertEqual(self.processor._is_valid_audio(file), expected)
+    
+    def test_predicates_thread_safe(self):
+        """Test the pure helpers give the same answers when called from many threads."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        names = ['A01.jpg', 'B02.png', 'song.mp3', 'notes.txt', 'image_003_C1.JPEG']
+        calls = [(self.processor._is_valid_image, name) for name in names]
+        calls += [(self.processor._is_valid_audio, name) for name in names]
+        calls += [(self.processor.get_aspect_ratio_dimensions, ratio) for ratio in ['1:1', '16:9', '9:16', 'bad']]
+        calls += [(self.processor.group_images_by_prefix, names)]
+        
+        expected = [func(arg) for func, arg in calls]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(func, arg) for func, arg in calls * 20]
+            results = [future.result() for future in futures]
+        self.assertEqual(results, expected * 20)
     
     def test_calculate_image_duration(self):
         """Test image duration calculation."""
@@ -127,6 +147,60 @@ class TestVideoProcessor(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             self.processor._validate_inputs(['image.jpg'], 'nonexistent.mp3', 'output.mp4')
     
+    def test_is_green_screen_frame(self):
+        """Test green screen frame detection."""
+        import numpy as np
+        
+        green = np.zeros((4, 4, 3), dtype=np.uint8)
+        green[:, :, 1] = 255
+        self.assertTrue(self.processor._is_green_screen_frame(green))
+        
+        red = np.zeros((4, 4, 3), dtype=np.uint8)
+        red[:, :, 0] = 255
+        self.assertFalse(self.processor._is_green_screen_frame(red))
+        
+        # Half green: below the default threshold, above a lower one
+        half = red.copy()
+        half[:2] = green[:2]
+        self.assertFalse(self.processor._is_green_screen_frame(half))
+        self.assertTrue(self.processor._is_green_screen_frame(half, threshold=0.4))
+        
+        # Hue just under the green window, dark green and washed-out green
+        for color in [(167, 250, 0), (0, 49, 0), (200, 240, 200)]:
+            frame = np.full((2, 2, 3), color, dtype=np.uint8)
+            self.assertFalse(self.processor._is_green_screen_frame(frame, threshold=0.0))
+
+    def test_are_green_screen_frames(self):
+        """Test batched green screen detection matches the single-frame check."""
+        import numpy as np
+
+        batch = np.zeros((3, 4, 4, 3), dtype=np.uint8)
+        batch[0, :, :, 1] = 255
+        batch[1, :, :, 0] = 255
+        batch[2, :2, :, 1] = 255
+        flags = self.processor._are_green_screen_frames(batch, threshold=0.4)
+        self.assertEqual(list(flags), [self.processor._is_green_screen_frame(frame, 0.4) for frame in batch])
+        self.assertEqual(list(flags), [True, False, True])
+
+    def test_green_kernels_match_numpy(self):
+        """Test the compiled green screen kernels agree with the numpy ones."""
+        import numpy as np
+        from core import _green_kernels
+        
+        if _green_kernels.numba is None:
+            self.skipTest("numba is not installed")
+        
+        rng = np.random.default_rng(0)
+        frames = rng.integers(0, 256, size=(6, 33, 47, 3), dtype=np.uint8)
+        frames[1, :, :, 1] = 255
+        frames[2, :20] = (40, 200, 30)
+        total = frames.shape[1] * frames.shape[2]
+        for needed in [0, 1, total // 4, total // 2, total]:
+            expected = _green_kernels.has_green_pixels_batch_numpy(frames, needed)
+            self.assertEqual(list(_green_kernels.has_green_pixels_batch(frames, needed)), list(expected))
+            for frame, flag in zip(frames, expected):
+                self.assertEqual(bool(_green_kernels.has_green_pixels(frame, needed)), bool(flag))
+    
     def test_error_handling(self):
         """Test error handling in video processing."""
         # Test with invalid parameters